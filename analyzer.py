@@ -3,62 +3,124 @@ Módulo de análisis de reuniones.
 Contiene la lógica para procesar transcripciones y generar JSON estructurado.
 """
 
-import json
+import copy
+import time
 import requests
-from typing import Dict
+from typing import Dict, List, Optional, Tuple
 
 import config
+from utils.analysis_schema import (
+    ANALYSIS_JSON_SCHEMA,
+    BATCH_JSON_SCHEMA,
+    coerce_analysis,
+    parse_analysis,
+    parse_json,
+    response_format,
+)
+
+
+# Tokens consumidos por modo de envío, para comparar tokens por documento
+TOKEN_STATS = {
+    "single": {"requests": 0, "documents": 0, "prompt_tokens": 0, "completion_tokens": 0},
+    "batch": {"requests": 0, "documents": 0, "prompt_tokens": 0, "completion_tokens": 0},
+}
+
+# Resultado de la validación de salidas del modelo
+VALIDATION_STATS = {"valid": 0, "repaired": 0, "reasked": 0, "failed": 0}
+
+# Latencia, tokens y escalamientos por ruta de modelo
+ROUTING_STATS = {
+    route: {"requests": 0, "documents": 0, "latency_seconds": 0.0, "tokens": 0, "escalations": 0}
+    for route in ("fast", "default", "strong")
+}
+
+# Scores de habilidades que, si son todos 0 en una reunión larga, indican baja confianza
+SKILL_SCORE_FIELDS = ["claridad_pitch", "negociacion_habilidades", "resolucion_objecciones"]
 
 
 def load_system_prompt() -> str:
     """Carga el system prompt desde el archivo de configuración."""
-    prompt_path = config.PROMPTS_DIR / "system_prompt.txt"
+    return _load_prompt("system_prompt.txt")
+
+
+def load_batch_instructions() -> str:
+    """Carga las instrucciones adicionales para el modo lote."""
+    return _load_prompt("batch_instructions.txt")
+
+
+def _load_prompt(filename: str) -> str:
+    prompt_path = config.PROMPTS_DIR / filename
 
     if not prompt_path.exists():
         raise FileNotFoundError(
-            f"ERROR: No se encontró {prompt_path}\n" "Asegúrate de que existe prompts/system_prompt.txt"
+            f"ERROR: No se encontró {prompt_path}\n" f"Asegúrate de que existe prompts/{filename}"
         )
 
     with open(prompt_path, "r", encoding="utf-8") as f:
         return f.read().strip()
 
 
-def analyze_transcription(transcription: str, verbose: bool = True) -> Dict:
+def _trim_transcription(transcription: str) -> str:
+    """Trunca la transcripción al máximo de caracteres configurado."""
+    max_chars = config.MAX_TRANSCRIPTION_CHARS
+    return transcription[:max_chars] if len(transcription) > max_chars else transcription
+
+
+def _record_usage(mode: str, usage: Dict, documents: int):
+    stats = TOKEN_STATS[mode]
+    stats["requests"] += 1
+    stats["documents"] += documents
+    stats["prompt_tokens"] += usage.get("prompt_tokens", 0)
+    stats["completion_tokens"] += usage.get("completion_tokens", 0)
+
+
+def _chat_completion(
+    messages: List[Dict],
+    max_tokens: int,
+    timeout: int,
+    model: Optional[str] = None,
+    schema: Optional[Dict] = None,
+    schema_name: str = "farmer_meeting_analysis",
+    verbose: bool = False,
+) -> Tuple[str, Dict]:
     """
-    Analiza una transcripción y devuelve datos estructurados.
+    Envía una petición de chat completion y devuelve el contenido y el uso de tokens.
 
     Args:
-        transcription: Texto de la transcripción de la reunión
+        messages: Mensajes de la conversación
+        max_tokens: Máximo de tokens de salida
+        timeout: Timeout de la petición en segundos
+        model: Modelo a usar (default: config.MODEL)
+        schema: JSON Schema de la respuesta (se envía como response_format si está habilitado)
+        schema_name: Nombre del esquema en response_format
         verbose: Si True, muestra la respuesta cruda del modelo
 
     Returns:
-        Dict con los datos estructurados de la reunión
+        Tupla (contenido de la respuesta, dict de uso de tokens)
 
     Raises:
-        Exception: Si hay errores en la API o el parsing
+        Exception: Si hay errores en la API o la respuesta está vacía
     """
-    system_prompt = load_system_prompt()
     url = f"{config.BASE_URL}/chat/completions"
 
-    # Truncar transcripción si es muy larga
-    max_chars = 2500
-    transcription_trimmed = transcription[:max_chars] if len(transcription) > max_chars else transcription
-
     payload = {
-        "model": config.MODEL,
-        "temperature": 0.3,
-        "max_tokens": 800,
-        "messages": [{"role": "system", "content": system_prompt}, {"role": "user", "content": transcription_trimmed}],
+        "model": model or config.MODEL,
+        "temperature": config.TEMPERATURE,
+        "max_tokens": max_tokens,
+        "messages": messages,
     }
 
+    if schema and config.STRUCTURED_OUTPUT:
+        payload["response_format"] = response_format(schema, schema_name)
+
     headers = {"Content-Type": "application/json", "Authorization": f"Bearer {config.API_KEY}"}
 
     # Realizar petición a la API
     try:
-        response = requests.post(url, headers=headers, json=payload, timeout=config.TIMEOUT)
+        response = requests.post(url, headers=headers, json=payload, timeout=timeout)
         response.raise_for_status()
     except requests.exceptions.Timeout:
-        raise Exception(f"TIMEOUT: La API tardó más de {config.TIMEOUT} segundos")
+        raise Exception(f"TIMEOUT: La API tardó más de {timeout} segundos")
     except requests.exceptions.RequestException as e:
         raise Exception(f"ERROR EN LA PETICIÓN: {e}")
 
@@ -89,17 +151,428 @@ def analyze_transcription(transcription: str, verbose: bool = True) -> Dict:
     if finish_reason == "length":
         print("ADVERTENCIA: Respuesta truncada. Considera aumentar MAX_TOKENS.")
 
-    raw_output = choice["message"]["content"].strip()
+    raw_output = (choice["message"]["content"] or "").strip()
 
     if not raw_output:
         raise Exception("El modelo devolvió contenido vacío")
 
-    # Parsear JSON
-    try:
-        structured_data = json.loads(raw_output)
-    except Exception as e:
-        print("ERROR PARSEANDO JSON")
+    return raw_output, response_json.get("usage") or {}
+
+
+def configure_routes(
+    fast_model: Optional[str] = None, default_model: Optional[str] = None, strong_model: Optional[str] = None
+):
+    """
+    Cambia el modelo de cada ruta en este proceso.
+
+    config.ROUTES se arma al importar config, así que las variables de entorno que
+    otra tarea de Airflow define después no llegan a este proceso.
+
+    Args:
+        fast_model: Modelo de la ruta "fast" (None = sin cambios)
+        default_model: Modelo de la ruta "default" (None = sin cambios)
+        strong_model: Modelo de la ruta "strong" (None = sin cambios)
+    """
+    for route, model in (("fast", fast_model), ("default", default_model), ("strong", strong_model)):
+        if model:
+            config.ROUTES[route]["model"] = model
+
+
+def select_route(transcription: str) -> str:
+    """
+    Elige la ruta inicial de modelo según el tamaño de la transcripción.
+
+    Args:
+        transcription: Transcripción ya truncada
+
+    Returns:
+        "fast" para transcripciones cortas, "default" para el resto
+    """
+    return "fast" if len(transcription) < config.ROUTE_FAST_MAX_CHARS else "default"
+
+
+def _needs_escalation(structured_data: Optional[Dict], errors: List[str], transcription: str) -> bool:
+    """
+    Escala si la salida no valida. Con config.ESCALATE_ON_ZERO_SCORES, también si una
+    reunión larga no tiene ningún score de habilidades.
+    """
+    if errors:
+        return True
+    if not config.ESCALATE_ON_ZERO_SCORES:
+        return False
+    long_meeting = len(transcription) >= config.ROUTE_FAST_MAX_CHARS
+    return long_meeting and all(structured_data[field] == 0 for field in SKILL_SCORE_FIELDS)
+
+
+def _record_route_request(route: str, started: float, usage: Dict):
+    stats = ROUTING_STATS[route]
+    stats["requests"] += 1
+    stats["latency_seconds"] += time.monotonic() - started
+    stats["tokens"] += usage.get("total_tokens", 0)
+
+
+def _analyze_with_route(
+    route: str, messages: List[Dict], verbose: bool, reask: bool
+) -> Tuple[Optional[Dict], bool, List[str], str]:
+    """
+    Ejecuta el análisis con el modelo de una ruta y valida la salida.
+
+    Args:
+        route: Ruta de modelo ("fast", "default" o "strong")
+        messages: Mensajes iniciales (system + transcripción)
+        verbose: Si True, muestra la respuesta cruda del modelo
+        reask: Si True, vuelve a preguntar al mismo modelo cuando la salida no valida
+
+    Returns:
+        Tupla (análisis, si fue reparado, errores de validación, última salida cruda)
+    """
+    route_config = config.ROUTES[route]
+    ROUTING_STATS[route]["documents"] += 1
+
+    def call(call_messages: List[Dict]) -> str:
+        started = time.monotonic()
+        usage = {}
+        try:
+            raw, usage = _chat_completion(
+                call_messages,
+                route_config["max_tokens"],
+                config.TIMEOUT,
+                model=route_config["model"],
+                schema=ANALYSIS_JSON_SCHEMA,
+                verbose=verbose,
+            )
+        finally:
+            # Las peticiones fallidas (timeouts, errores HTTP) también cuentan en la latencia de la ruta
+            _record_route_request(route, started, usage)
+        _record_usage("single", usage, 0)
+        return raw
+
+    raw_output = call(messages)
+
+    # Validar JSON (con reparación local de defectos comunes)
+    structured_data, repaired, errors = parse_analysis(raw_output)
+
+    reasks = 0
+    while reask and errors and reasks < config.MAX_REASKS:
+        # Volver a pedir al modelo indicando los errores de validación
+        reasks += 1
+        VALIDATION_STATS["reasked"] += 1
+        print(f"Salida inválida, re-preguntando al modelo: {errors}")
+        messages = messages + [
+            {"role": "assistant", "content": raw_output},
+            {
+                "role": "user",
+                "content": "La respuesta anterior no cumple el formato de salida. Errores: "
+                + "; ".join(errors)
+                + ". Devuelve SOLO el JSON corregido.",
+            },
+        ]
+        raw_output = call(messages)
+        structured_data, repaired, errors = parse_analysis(raw_output)
+
+    return structured_data, repaired, errors, raw_output
+
+
+def analyze_transcription(transcription: str, verbose: bool = True, route: Optional[str] = None) -> Dict:
+    """
+    Analiza una transcripción y devuelve datos estructurados.
+
+    Las transcripciones cortas van al modelo rápido (config.FAST_MODEL) y el resto
+    a config.MODEL. Si la salida no cumple el esquema se escala a config.STRONG_MODEL
+    (ver _needs_escalation).
+
+    Args:
+        transcription: Texto de la transcripción de la reunión
+        verbose: Si True, muestra la respuesta cruda del modelo
+        route: Ruta inicial (default: select_route); "strong" no escala y re-pregunta
+
+    Returns:
+        Dict con los datos estructurados de la reunión
+
+    Raises:
+        Exception: Si hay errores en la API o el parsing
+    """
+    system_prompt = load_system_prompt()
+    transcription_trimmed = _trim_transcription(transcription)
+
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": transcription_trimmed},
+    ]
+
+    TOKEN_STATS["single"]["documents"] += 1
+
+    route = route or select_route(transcription_trimmed)
+    structured_data, repaired, errors, raw_output = _analyze_with_route(
+        route, messages, verbose, reask=route == "strong"
+    )
+
+    if route != "strong" and _needs_escalation(structured_data, errors, transcription_trimmed):
+        print(f"Escalando de la ruta '{route}' a 'strong' ({config.ROUTES['strong']['model']})")
+        ROUTING_STATS[route]["escalations"] += 1
+        strong_data, strong_repaired, strong_errors, strong_raw = _analyze_with_route(
+            "strong", messages, verbose, reask=True
+        )
+
+        # Si el modelo fuerte tampoco valida, se conserva la salida válida de la primera ruta
+        if not strong_errors or errors:
+            structured_data, repaired, errors, raw_output = strong_data, strong_repaired, strong_errors, strong_raw
+
+    if errors:
+        print("ERROR VALIDANDO JSON")
         print(f"Contenido:\n{raw_output}")
-        raise Exception(f"No se pudo parsear el JSON: {e}")
+        VALIDATION_STATS["failed"] += 1
+        raise Exception(f"El análisis no cumple el esquema: {'; '.join(errors)}")
 
+    VALIDATION_STATS["repaired" if repaired else "valid"] += 1
     return structured_data
+
+
+def _pack_documents(documents: List[Dict], batch_size: int) -> List[List[Dict]]:
+    """Agrupa documentos en lotes respetando el tamaño y el máximo de caracteres."""
+    batches = []
+    current = []
+    current_chars = 0
+
+    for doc in documents:
+        doc_chars = len(doc["transcription"])
+        if current and (len(current) >= batch_size or current_chars + doc_chars > config.BATCH_MAX_CHARS):
+            batches.append(current)
+            current = []
+            current_chars = 0
+        current.append(doc)
+        current_chars += doc_chars
+
+    if current:
+        batches.append(current)
+
+    return batches
+
+
+def _parse_batch_output(raw_output: str, expected_ids: List[str]) -> Dict[str, Dict]:
+    """
+    Valida la respuesta de un lote y devuelve los análisis por document_id.
+
+    Los elementos mal formados, duplicados, con IDs desconocidos o que no cumplen
+    el esquema (tras la reparación local) se descartan;
+    los documentos que falten se reintentan individualmente.
+    """
+    try:
+        data = parse_json(raw_output)
+    except ValueError as e:
+        raise Exception(f"No se pudo parsear el JSON del lote: {e}")
+
+    items = data.get("analisis") if isinstance(data, dict) else None
+    if not isinstance(items, list):
+        raise Exception("La respuesta del lote no contiene la lista 'analisis'")
+
+    results = {}
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        document_id = str(item.get("document_id", "")).strip()
+        if document_id not in expected_ids or document_id in results:
+            continue
+        analysis, repaired, errors = coerce_analysis(item.get("resultado"))
+        if errors:
+            continue
+        VALIDATION_STATS["repaired" if repaired else "valid"] += 1
+        results[document_id] = analysis
+
+    return results
+
+
+def analyze_transcriptions_batch(
+    documents: List[Dict], batch_size: Optional[int] = None, verbose: bool = False
+) -> Tuple[Dict[str, Dict], Dict[str, str]]:
+    """
+    Analiza varias transcripciones empaquetándolas en una sola petición por lote.
+
+    El system prompt se envía una vez por lote en lugar de una vez por documento.
+    Cada lote usa la ruta "fast" si todas sus transcripciones son cortas y "default"
+    si no. Los documentos que vienen en la respuesta pero no validan se escalan y se
+    reintentan individualmente en la ruta "strong". Si falla el lote completo (timeout,
+    error HTTP, JSON truncado), sus documentos se reintentan con analyze_transcription
+    en su ruta normal, que solo escala si la salida no valida.
+
+    Args:
+        documents: Lista de dicts con "document_id" y "transcription"
+        batch_size: Máximo de documentos por petición (default: config.BATCH_SIZE)
+        verbose: Si True, muestra la respuesta cruda del modelo
+
+    Returns:
+        Tupla (análisis por document_id, errores por document_id)
+    """
+    batch_size = batch_size or config.BATCH_SIZE
+    # Que la salida de un lote completo quepa en el tope de tokens de salida
+    batch_size = min(batch_size, max(config.BATCH_MAX_OUTPUT_TOKENS // config.MAX_TOKENS, 1))
+    system_prompt = f"{load_system_prompt()}\n\n{load_batch_instructions()}"
+
+    trimmed = [
+        {"document_id": str(doc["document_id"]), "transcription": _trim_transcription(doc["transcription"])}
+        for doc in documents
+    ]
+
+    results = {}
+    errors = {}
+
+    for batch in _pack_documents(trimmed, max(batch_size, 1)):
+        expected_ids = [doc["document_id"] for doc in batch]
+        batch_results = {}
+        retry_route = None
+
+        if len(batch) > 1:
+            route = "fast" if all(select_route(doc["transcription"]) == "fast" for doc in batch) else "default"
+            route_config = config.ROUTES[route]
+            ROUTING_STATS[route]["documents"] += len(batch)
+
+            user_content = "\n\n".join(
+                f"### DOCUMENTO {doc['document_id']}\n{doc['transcription']}" for doc in batch
+            )
+            messages = [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_content},
+            ]
+
+            try:
+                started = time.monotonic()
+                usage = {}
+                try:
+                    raw_output, usage = _chat_completion(
+                        messages,
+                        min(route_config["max_tokens"] * len(batch), config.BATCH_MAX_OUTPUT_TOKENS),
+                        config.BATCH_TIMEOUT,
+                        model=route_config["model"],
+                        schema=BATCH_JSON_SCHEMA,
+                        schema_name="farmer_meeting_analysis_batch",
+                        verbose=verbose,
+                    )
+                finally:
+                    _record_route_request(route, started, usage)
+                _record_usage("batch", usage, 0)
+                batch_results = _parse_batch_output(raw_output, expected_ids)
+                TOKEN_STATS["batch"]["documents"] += len(batch_results)
+
+                # La respuesta llegó y se parseó: los documentos que faltan no validaron y se escalan
+                retry_route = "strong"
+                ROUTING_STATS[route]["escalations"] += len(batch) - len(batch_results)
+            except Exception as e:
+                print(f"Error analizando lote de {len(batch)} documentos: {e}")
+
+            print(f"Lote de {len(batch)} documentos ({route}): {len(batch_results)} análisis válidos")
+
+        results.update(batch_results)
+
+        # Reintentar individualmente los documentos que faltaron en el lote
+        for doc in batch:
+            if doc["document_id"] in batch_results:
+                continue
+            try:
+                results[doc["document_id"]] = analyze_transcription(
+                    doc["transcription"], verbose=verbose, route=retry_route
+                )
+            except Exception as e:
+                print(f"Error analizando documento {doc['document_id']}: {e}")
+                errors[doc["document_id"]] = str(e)
+
+    return results, errors
+
+
+def token_usage_summary() -> Dict[str, Dict]:
+    """
+    Resume el consumo de tokens por documento en modo individual y en modo lote.
+
+    Returns:
+        Dict por modo con peticiones, documentos y tokens promedio por documento
+    """
+    summary = {}
+    for mode, stats in TOKEN_STATS.items():
+        documents = stats["documents"]
+        summary[mode] = {
+            "requests": stats["requests"],
+            "documents": documents,
+            "prompt_tokens_per_doc": round(stats["prompt_tokens"] / documents, 1) if documents else 0,
+            "completion_tokens_per_doc": round(stats["completion_tokens"] / documents, 1) if documents else 0,
+        }
+    return summary
+
+
+def validation_summary() -> Dict[str, int]:
+    """
+    Devuelve los contadores de validación de salidas del modelo.
+
+    Returns:
+        Dict con salidas válidas, reparadas localmente, re-preguntadas y fallidas
+    """
+    return dict(VALIDATION_STATS)
+
+
+def routing_summary() -> Dict[str, Dict]:
+    """
+    Resume latencia, tokens y tasa de escalamiento por ruta de modelo.
+
+    Returns:
+        Dict por ruta con modelo, documentos, latencia y tokens promedio por petición
+        y tasa de escalamiento
+    """
+    summary = {}
+    for route, stats in ROUTING_STATS.items():
+        requests_count = stats["requests"]
+        documents = stats["documents"]
+        summary[route] = {
+            "model": config.ROUTES[route]["model"],
+            "documents": documents,
+            "requests": requests_count,
+            "avg_latency_seconds": round(stats["latency_seconds"] / requests_count, 2) if requests_count else 0,
+            "avg_tokens": round(stats["tokens"] / requests_count, 1) if requests_count else 0,
+            "escalation_rate": round(stats["escalations"] / documents, 3) if documents else 0,
+        }
+    return summary
+
+
+def stats_snapshot() -> Dict[str, Dict]:
+    """
+    Copia los contadores de tokens, validación y ruteo de este proceso.
+
+    Returns:
+        Dict con "tokens", "validation" y "routing"
+    """
+    return copy.deepcopy({"tokens": TOKEN_STATS, "validation": VALIDATION_STATS, "routing": ROUTING_STATS})
+
+
+def stats_since(snapshot: Dict[str, Dict]) -> Dict[str, Dict]:
+    """
+    Calcula lo que sumaron los contadores desde un snapshot (p. ej. en un proceso worker).
+
+    Args:
+        snapshot: Resultado de stats_snapshot
+
+    Returns:
+        Dict con la misma forma que stats_snapshot, con los incrementos
+    """
+
+    def diff(after, before):
+        return {
+            key: diff(value, before[key]) if isinstance(value, dict) else value - before[key]
+            for key, value in after.items()
+        }
+
+    return diff(stats_snapshot(), snapshot)
+
+
+def merge_stats(delta: Dict[str, Dict]):
+    """
+    Suma a los contadores de este proceso los incrementos calculados en otro (ver stats_since).
+
+    Args:
+        delta: Incrementos por contador
+    """
+
+    def add(target, increments):
+        for key, value in increments.items():
+            if isinstance(value, dict):
+                add(target[key], value)
+            else:
+                target[key] += value
+
+    add({"tokens": TOKEN_STATS, "validation": VALIDATION_STATS, "routing": ROUTING_STATS}, delta)
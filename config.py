@@ -10,13 +10,46 @@ from pathlib import Path
 BASE_DIR = Path(__file__).parent
 PROMPTS_DIR = BASE_DIR / "prompts"
 
+# Carpeta raíz de Drive (en Airflow se toma de la variable farmer_mass_drive_folder_url)
+DRIVE_FOLDER_URL = os.getenv(
+    "DRIVE_FOLDER_URL", "https://drive.google.com/drive/u/0/folders/1iLJ8xFfYlRSbwaAtmthFQD8PT7AQsJzC"
+)
+
 # Configuración de la API (se cargan desde Airflow Variables)
 # Core LLM Proxy de Rappi - No requiere API key real desde Airflow
 API_KEY = os.getenv("API_KEY", "dummykey")
 BASE_URL = os.getenv("BASE_URL", "https://core-llm-proxy-external.security.rappi.com/api/core-llm-proxy/openai/v1")
 MODEL = os.getenv("MODEL", "gpt-4o-mini")
+FAST_MODEL = os.getenv("FAST_MODEL", "gpt-4.1-nano")
+STRONG_MODEL = os.getenv("STRONG_MODEL", "gpt-4o")
 
 # Parámetros del modelo
 TEMPERATURE = 0.3
 MAX_TOKENS = 800
 TIMEOUT = 30
+MAX_TRANSCRIPTION_CHARS = 2500
+
+# Salida estructurada (response_format JSON Schema) y re-preguntas ante salidas inválidas
+STRUCTURED_OUTPUT = os.getenv("STRUCTURED_OUTPUT", "true").lower() == "true"
+MAX_REASKS = 1
+
+# Ruteo de modelos: transcripciones cortas al modelo rápido, escalamiento al fuerte
+ROUTE_FAST_MAX_CHARS = int(os.getenv("ROUTE_FAST_MAX_CHARS", "1200"))
+# Escalar también reuniones largas con todos los scores de habilidades en 0 (además de salidas inválidas)
+ESCALATE_ON_ZERO_SCORES = os.getenv("ESCALATE_ON_ZERO_SCORES", "false").lower() == "true"
+ROUTES = {
+    "fast": {"model": FAST_MODEL, "max_tokens": MAX_TOKENS},
+    "default": {"model": MODEL, "max_tokens": MAX_TOKENS},
+    "strong": {"model": STRONG_MODEL, "max_tokens": MAX_TOKENS},
+}
+
+# Empaquetado de varias transcripciones por petición (1 = deshabilitado)
+BATCH_SIZE = int(os.getenv("BATCH_SIZE", "1"))
+BATCH_MAX_CHARS = int(os.getenv("BATCH_MAX_CHARS", "12000"))
+BATCH_TIMEOUT = 90
+# Tope de tokens de salida por petición de lote (límite de salida de los modelos de las rutas)
+BATCH_MAX_OUTPUT_TOKENS = int(os.getenv("BATCH_MAX_OUTPUT_TOKENS", "16000"))
+
+# Presupuesto de tiempo por ejecución del DAG (programado cada 4 horas)
+RUN_DEADLINE_MINUTES = int(os.getenv("RUN_DEADLINE_MINUTES", "200"))
+SCHEDULER_DEFAULT_DOC_SECONDS = 20
@@ -4,13 +4,15 @@ Procesa documentos de Google Drive, analiza con LLM y guarda en Snowflake.
 """
 
 from __future__ import annotations
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import os
 import sys
 import json
+import time
 
 from airflow.decorators import dag, task
 from airflow.models.variable import Variable
+from airflow.operators.python import get_current_context
 
 # from airflow.providers.snowflake.hooks.snowflake import SnowflakeHook  # Temporalmente deshabilitado
 
@@ -21,12 +23,19 @@ from utils.google_drive_manager import GoogleDriveManager  # noqa: E402
 
 # from utils.snowflake_manager import SnowflakeManager  # Temporalmente deshabilitado
 import analyzer  # noqa: E402
+import pipeline  # noqa: E402
+from scheduler import RunScheduler  # noqa: E402
 
 
 # --- CONFIGURACIÓN ---
 # SNOWFLAKE_CONN_ID = "CONN_SNOWFLAKE"  # Temporalmente deshabilitado
 GOOGLE_CREDS_VAR_KEY = "google_sheet_creds_upload_v2"
 DRIVE_FOLDER_URL_VAR_KEY = "farmer_mass_drive_folder_url"
+BATCH_SIZE_VAR_KEY = "farmer_mass_batch_size"
+SCHEDULER_STATE_VAR_KEY = "farmer_mass_scheduler_state"
+MODEL_VAR_KEY = "llm_model"
+FAST_MODEL_VAR_KEY = "llm_fast_model"
+STRONG_MODEL_VAR_KEY = "llm_strong_model"
 
 
 @dag(
@@ -76,7 +85,7 @@ def farmer_mass_analysis_pipeline():
             "llm_base_url",
             default_var="https://core-llm-proxy-external.security.rappi.com/api/core-llm-proxy/openai/v1"
         )
-        os.environ["MODEL"] = Variable.get("llm_model", default_var="gpt-4o-mini")
+        os.environ["MODEL"] = Variable.get(MODEL_VAR_KEY, default_var="gpt-4o-mini")
 
         print("Entorno configurado correctamente")
         return {"status": "success"}
@@ -98,33 +107,7 @@ def farmer_mass_analysis_pipeline():
         if not folder_id:
             raise ValueError(f"No se pudo extraer folder_id de: {drive_folder_url}")
 
-        # Listar subcarpetas (cada reunión)
-        meeting_folders = drive_manager.list_folders(folder_id)
-
-        documents_to_process = []
-
-        for meeting_folder in meeting_folders:
-            meeting_id = meeting_folder["id"]
-            meeting_name = meeting_folder["name"]
-
-            print(f"Procesando carpeta: {meeting_name}")
-
-            # Buscar documento "Notas - ..."
-            doc = drive_manager.find_document_by_name(meeting_id, "Notas")
-
-            if doc:
-                documents_to_process.append(
-                    {
-                        "folder_id": meeting_id,
-                        "folder_name": meeting_name,
-                        "document_id": doc["id"],
-                        "document_name": doc["name"],
-                        "document_url": f"https://docs.google.com/document/d/{doc['id']}",
-                    }
-                )
-
-        print(f"Encontrados {len(documents_to_process)} documentos para procesar")
-        return documents_to_process
+        return pipeline.scan_documents(drive_manager, folder_id)
 
     @task
     def process_documents(documents: list):
@@ -133,6 +116,14 @@ def farmer_mass_analysis_pipeline():
 
         drive_manager = GoogleDriveManager()
 
+        # Modelos por ruta: se leen aquí porque las variables de entorno de setup_environment
+        # no llegan al proceso de esta tarea
+        analyzer.configure_routes(
+            fast_model=Variable.get(FAST_MODEL_VAR_KEY, default_var=None),
+            default_model=Variable.get(MODEL_VAR_KEY, default_var=None),
+            strong_model=Variable.get(STRONG_MODEL_VAR_KEY, default_var=None),
+        )
+
         # TODO: Snowflake temporalmente deshabilitado
         # sf_manager = SnowflakeManager()
         # sf_manager.connect()
@@ -142,7 +133,33 @@ def farmer_mass_analysis_pipeline():
         skipped_count = 0
         error_count = 0
 
-        for doc_info in documents:
+        # Ordenar por prioridad y admitir trabajo solo mientras quepa antes del deadline
+        # El deadline se mide desde el inicio del DAG run, incluyendo setup y escaneo
+        dag_run_start = get_current_context()["dag_run"].start_date
+        already_elapsed = (datetime.now(timezone.utc) - dag_run_start).total_seconds() if dag_run_start else 0.0
+
+        scheduler_state = Variable.get(SCHEDULER_STATE_VAR_KEY, default_var={}, deserialize_json=True)
+        scheduler = RunScheduler(state=scheduler_state, already_elapsed=already_elapsed)
+
+        # Solo documentos sin análisis: los terminados en ejecuciones anteriores no se vuelven a leer
+        pending_documents = scheduler.pending(documents)
+        print(
+            f"Pendientes: {len(pending_documents)} de {len(documents)} documentos "
+            f"(remanente de la ejecución anterior: {len(scheduler.previous_carried_over)})"
+        )
+
+        # Transcripciones por analizar: varias por petición si el lote está habilitado
+        batch_size = int(Variable.get(BATCH_SIZE_VAR_KEY, default_var="1"))
+        pending = []
+        doc_seconds = {}
+
+        already_analyzed_count = 0
+
+        for doc_info in scheduler.order(pending_documents):
+            if not scheduler.admit(doc_info):
+                continue
+
+            started = time.monotonic()
             try:
                 document_id = doc_info["document_id"]
 
@@ -152,57 +169,157 @@ def farmer_mass_analysis_pipeline():
                 #     skipped_count += 1
                 #     continue
 
-                print(f"\nProcesando: {doc_info['document_name']}")
+                print(f"\nLeyendo: {doc_info['document_name']}")
 
                 # Leer contenido
-                transcription = drive_manager.read_document_content(document_id)
+                transcription, already_analyzed = pipeline.read_document(drive_manager, doc_info)
 
-                if not transcription or len(transcription) < 100:
-                    print("Transcripción muy corta o vacía, omitiendo...")
-                    skipped_count += 1
+                if already_analyzed:
+                    # Analizado antes de que el scheduler registrara documentos terminados
+                    print("El documento ya tiene una sección de análisis, omitiendo...")
+                    scheduler.mark_done(doc_info)
+                    already_analyzed_count += 1
                     continue
 
-                # Analizar con LLM
-                print("Analizando con LLM...")
-                analysis_result = analyzer.analyze_transcription(transcription, verbose=False)
-
-                # TODO: Guardar en Snowflake deshabilitado
-                # sf_manager.insert_analysis(
-                #     analysis_data=analysis_result,
-                #     document_id=document_id,
-                #     folder_id=doc_info['folder_id'],
-                #     link_documento=doc_info['document_url']
-                # )
-
-                # Agregar sección de análisis al documento
-                analysis_text = json.dumps(analysis_result, indent=2, ensure_ascii=False)
-                drive_manager.create_document_tab(document_id, "Análisis - Farmer", analysis_text)
+                if transcription is None:
+                    scheduler.release(doc_info)
+                    skipped_count += 1
+                    continue
 
-                processed_count += 1
-                print("Documento procesado exitosamente\n")
+                pending.append((doc_info, transcription))
+                doc_seconds[document_id] = time.monotonic() - started
 
             except Exception as e:
-                print(f"Error procesando {doc_info.get('document_name', 'unknown')}: {e}")
+                print(f"Error leyendo {doc_info.get('document_name', 'unknown')}: {e}")
+                scheduler.record(doc_info, time.monotonic() - started, success=False)
                 error_count += 1
                 continue
 
+        # Analizar por grupos (un lote o un documento), verificando el deadline antes de cada uno
+        group_size = batch_size if batch_size > 1 else 1
+
+        for group_start in range(0, len(pending), group_size):
+            group = pending[group_start : group_start + group_size]
+
+            if not scheduler.in_time([doc_info for doc_info, _ in group]):
+                remaining = pending[group_start:]
+                for doc_info, transcription in remaining:
+                    scheduler.defer(doc_info, transcript_chars=len(transcription))
+                print(f"Deadline alcanzado: {len(remaining)} documentos diferidos a la siguiente ejecución")
+                break
+
+            batch_analyses = {}
+            batch_errors = {}
+            if len(group) > 1:
+                print(f"Analizando lote de {len(group)} transcripciones...")
+                batch_started = time.monotonic()
+                batch_analyses, batch_errors = analyzer.analyze_transcriptions_batch(
+                    [{"document_id": d["document_id"], "transcription": t} for d, t in group],
+                    batch_size=batch_size,
+                    verbose=False,
+                )
+                # Repartir el tiempo del lote entre sus documentos
+                batch_share = (time.monotonic() - batch_started) / len(group)
+                for doc_info, _ in group:
+                    doc_seconds[doc_info["document_id"]] += batch_share
+
+            for doc_info, transcription in group:
+                started = time.monotonic()
+                try:
+                    document_id = doc_info["document_id"]
+
+                    print(f"\nProcesando: {doc_info['document_name']}")
+
+                    if document_id in batch_errors:
+                        raise Exception(batch_errors[document_id])
+
+                    if document_id in batch_analyses:
+                        analysis_result = batch_analyses[document_id]
+                    else:
+                        # Analizar con LLM
+                        print("Analizando con LLM...")
+                        analysis_result = analyzer.analyze_transcription(transcription, verbose=False)
+
+                    # TODO: Guardar en Snowflake deshabilitado
+                    # sf_manager.insert_analysis(
+                    #     analysis_data=analysis_result,
+                    #     document_id=document_id,
+                    #     folder_id=doc_info['folder_id'],
+                    #     link_documento=doc_info['document_url']
+                    # )
+
+                    # Agregar sección de análisis al documento
+                    pipeline.write_analysis(drive_manager, doc_info, analysis_result)
+
+                    processed_count += 1
+                    scheduler.record(
+                        doc_info,
+                        doc_seconds[document_id] + time.monotonic() - started,
+                        success=True,
+                        transcript_chars=len(transcription),
+                    )
+                    print("Documento procesado exitosamente\n")
+
+                except Exception as e:
+                    print(f"Error procesando {doc_info.get('document_name', 'unknown')}: {e}")
+                    scheduler.record(
+                        doc_info,
+                        doc_seconds[doc_info["document_id"]] + time.monotonic() - started,
+                        success=False,
+                        transcript_chars=len(transcription),
+                    )
+                    error_count += 1
+                    continue
+
         # TODO: Cerrar conexión Snowflake deshabilitado
         # sf_manager.close()
 
+        # Guardar remanente, reintentos y latencias para la siguiente ejecución
+        scheduler_state = scheduler.to_state()
+        Variable.set(SCHEDULER_STATE_VAR_KEY, scheduler_state, serialize_json=True)
+
         summary = {
             "total": len(documents),
+            "pending": len(pending_documents),
+            "already_analyzed": already_analyzed_count,
             "processed": processed_count,
             "skipped": skipped_count,
             "errors": error_count,
+            "deferred": scheduler_state["backlog"],
+            "elapsed_seconds": round(scheduler.elapsed(), 1),
+            "tokens": analyzer.token_usage_summary(),
+            "validation": analyzer.validation_summary(),
+            "routing": analyzer.routing_summary(),
         }
 
         print("\n" + "=" * 50)
         print("RESUMEN DE PROCESAMIENTO")
         print("=" * 50)
-        print(f"Total documentos: {summary['total']}")
+        print(f"Total documentos: {summary['total']} ({summary['pending']} pendientes)")
+        print(f"Ya analizados (sección existente): {summary['already_analyzed']}")
         print(f"Procesados: {summary['processed']}")
         print(f"Omitidos: {summary['skipped']}")
         print(f"Errores: {summary['errors']}")
+        print(f"Diferidos a la siguiente ejecución: {summary['deferred']}")
+        print(f"Duración: {summary['elapsed_seconds']} s")
+        for mode, usage in summary["tokens"].items():
+            if usage["documents"]:
+                print(
+                    f"Tokens por documento ({mode}): "
+                    f"{usage['prompt_tokens_per_doc']} prompt / {usage['completion_tokens_per_doc']} completion"
+                )
+        validation = summary["validation"]
+        print(
+            f"Validación: {validation['valid']} válidas, {validation['repaired']} reparadas, "
+            f"{validation['reasked']} re-preguntadas, {validation['failed']} fallidas"
+        )
+        for route, stats in summary["routing"].items():
+            if stats["documents"]:
+                print(
+                    f"Ruta {route} ({stats['model']}): {stats['documents']} documentos, "
+                    f"{stats['avg_latency_seconds']} s y {stats['avg_tokens']} tokens por petición, "
+                    f"escalamiento {stats['escalation_rate']:.1%}"
+                )
         print("=" * 50)
 
         return summary
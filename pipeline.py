@@ -0,0 +1,142 @@
+"""
+Pasos del pipeline compartidos por el DAG y el runner de línea de comandos.
+Escanea carpetas de Drive, lee transcripciones y escribe el análisis.
+"""
+
+import json
+import re
+from typing import Dict, List, Optional, Tuple
+
+import analyzer
+
+DOCUMENT_NAME_PATTERN = "Notas"
+ANALYSIS_SECTION_TITLE = "Análisis - Farmer"
+MIN_TRANSCRIPTION_CHARS = 100
+
+# Sección escrita por write_analysis al inicio del documento: el marcador y el JSON con indent=2,
+# que termina en la única línea "}" sin indentar
+ANALYSIS_SECTION_RE = re.compile(
+    r"\n*--- " + re.escape(ANALYSIS_SECTION_TITLE) + r" ---\n+\{.*?\n\}\n", re.DOTALL
+)
+
+
+def scan_documents(drive_manager, folder_id: str) -> List[Dict]:
+    """
+    Busca el documento de notas de cada subcarpeta de reunión.
+
+    Args:
+        drive_manager: Instancia de GoogleDriveManager
+        folder_id: ID de la carpeta raíz
+
+    Returns:
+        Lista de dicts con la información de cada documento encontrado
+    """
+    # Listar subcarpetas (cada reunión)
+    meeting_folders = drive_manager.list_folders(folder_id)
+
+    documents = []
+
+    for meeting_folder in meeting_folders:
+        meeting_id = meeting_folder["id"]
+        meeting_name = meeting_folder["name"]
+
+        print(f"Procesando carpeta: {meeting_name}")
+
+        # Buscar documento "Notas - ..."
+        doc = drive_manager.find_document_by_name(meeting_id, DOCUMENT_NAME_PATTERN)
+
+        if doc:
+            documents.append(
+                {
+                    "folder_id": meeting_id,
+                    "folder_name": meeting_name,
+                    "document_id": doc["id"],
+                    "document_name": doc["name"],
+                    "document_url": f"https://docs.google.com/document/d/{doc['id']}",
+                    "created_time": doc.get("createdTime") or meeting_folder.get("createdTime"),
+                }
+            )
+
+    print(f"Encontrados {len(documents)} documentos para procesar")
+    return documents
+
+
+def strip_analysis_sections(content: str) -> str:
+    """Quita del texto del documento las secciones de análisis agregadas en ejecuciones anteriores."""
+    return ANALYSIS_SECTION_RE.sub("", content)
+
+
+def read_document(drive_manager, doc_info: Dict) -> Tuple[Optional[str], bool]:
+    """
+    Lee la transcripción de un documento, sin las secciones de análisis previas.
+
+    Args:
+        drive_manager: Instancia de GoogleDriveManager
+        doc_info: Información del documento
+
+    Returns:
+        Tupla (texto de la transcripción o None si es muy corta o vacía, si ya tenía una sección de análisis)
+    """
+    content = drive_manager.read_document_content(doc_info["document_id"]) or ""
+    transcription = strip_analysis_sections(content)
+    already_analyzed = len(transcription) != len(content)
+
+    if len(transcription) < MIN_TRANSCRIPTION_CHARS:
+        print("Transcripción muy corta o vacía, omitiendo...")
+        return None, already_analyzed
+
+    return transcription, already_analyzed
+
+
+def read_transcription(drive_manager, doc_info: Dict) -> Optional[str]:
+    """
+    Lee la transcripción de un documento, sin las secciones de análisis previas.
+
+    Args:
+        drive_manager: Instancia de GoogleDriveManager
+        doc_info: Información del documento
+
+    Returns:
+        Texto de la transcripción, o None si es muy corta o vacía
+    """
+    transcription, _ = read_document(drive_manager, doc_info)
+    return transcription
+
+
+def write_analysis(drive_manager, doc_info: Dict, analysis_result: Dict):
+    """
+    Agrega el análisis como sección del documento original, reemplazando la de un análisis anterior.
+
+    Args:
+        drive_manager: Instancia de GoogleDriveManager
+        doc_info: Información del documento
+        analysis_result: Análisis validado
+    """
+    analysis_text = json.dumps(analysis_result, indent=2, ensure_ascii=False)
+    drive_manager.replace_document_section(
+        doc_info["document_id"], ANALYSIS_SECTION_TITLE, analysis_text, ANALYSIS_SECTION_RE
+    )
+
+
+def process_document(drive_manager, doc_info: Dict, write_drive: bool = True) -> Dict:
+    """
+    Lee, analiza y (opcionalmente) escribe en Drive un documento.
+
+    Args:
+        drive_manager: Instancia de GoogleDriveManager
+        doc_info: Información del documento
+        write_drive: Si True, agrega la sección de análisis al documento
+
+    Returns:
+        Dict con status ("processed" o "skipped"), análisis y tamaño de la transcripción
+    """
+    transcription = read_transcription(drive_manager, doc_info)
+    if transcription is None:
+        return {"status": "skipped", "analysis": None, "transcript_chars": 0}
+
+    analysis_result = analyzer.analyze_transcription(transcription, verbose=False)
+
+    if write_drive:
+        write_analysis(drive_manager, doc_info, analysis_result)
+
+    return {"status": "processed", "analysis": analysis_result, "transcript_chars": len(transcription)}
@@ -0,0 +1,357 @@
+"""
+Runner de línea de comandos para reprocesar reuniones fuera de Airflow.
+Ejecuta el mismo escaneo/lectura/análisis/escritura que el DAG, particionado
+por document_id (--shard i/n), con varios procesos y checkpoints reanudables.
+
+Ejemplo:
+    python run_backfill.py --shard 0/4 --workers 8 --snowflake --no-drive
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+import analyzer
+import config
+import pipeline
+from utils.google_drive_manager import GoogleDriveManager
+
+
+# Estado por proceso worker (se inicializa una vez por proceso)
+_worker_drive_manager = None
+_worker_write_drive = True
+
+
+def parse_shard(value: str) -> Tuple[int, int]:
+    """
+    Parsea un shard con formato "i/n" (i empieza en 0).
+
+    Args:
+        value: Texto del argumento --shard
+
+    Returns:
+        Tupla (índice, total)
+    """
+    try:
+        index, total = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Shard inválido '{value}', se esperaba i/n (ej: 0/4)")
+
+    if total < 1 or not 0 <= index < total:
+        raise argparse.ArgumentTypeError(f"Shard inválido '{value}': se requiere 0 <= i < n")
+
+    return index, total
+
+
+def in_shard(document_id: str, index: int, total: int) -> bool:
+    """Asigna un documento a un shard con un hash estable entre procesos y máquinas."""
+    return zlib.crc32(document_id.encode("utf-8")) % total == index
+
+
+def load_checkpoint(path: Path) -> Set[str]:
+    """
+    Carga los document_id ya terminados de un checkpoint JSONL.
+
+    Args:
+        path: Ruta del checkpoint
+
+    Returns:
+        Conjunto de document_id procesados u omitidos en ejecuciones anteriores
+    """
+    done = set()
+    if not path.exists():
+        return done
+
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # Última línea incompleta si el proceso se interrumpió
+                continue
+            if entry.get("status") in ("processed", "skipped"):
+                done.add(entry["document_id"])
+
+    return done
+
+
+def _init_worker(write_drive: bool):
+    global _worker_drive_manager, _worker_write_drive
+    _worker_drive_manager = GoogleDriveManager()
+    _worker_write_drive = write_drive
+
+
+def _process_in_worker(doc_info: Dict) -> Dict:
+    started = time.monotonic()
+    stats_before = analyzer.stats_snapshot()
+    try:
+        result = pipeline.process_document(_worker_drive_manager, doc_info, write_drive=_worker_write_drive)
+        result["error"] = None
+    except Exception as e:
+        result = {"status": "error", "analysis": None, "transcript_chars": 0, "error": str(e)}
+
+    result["doc_info"] = doc_info
+    result["seconds"] = time.monotonic() - started
+    # Los contadores del analyzer viven en el proceso worker: se devuelven con cada resultado
+    result["stats"] = analyzer.stats_since(stats_before)
+    return result
+
+
+class BackfillRunner:
+    """Ejecuta el pipeline sobre un shard de documentos con checkpoints."""
+
+    def __init__(
+        self,
+        checkpoint_path: Path,
+        workers: int = 1,
+        write_drive: bool = True,
+        sf_manager=None,
+        snowflake_batch_size: int = 50,
+        drive_manager=None,
+    ):
+        """
+        Inicializa el runner.
+
+        Con Snowflake, los workers solo analizan: el proceso principal escribe en Drive
+        después de que el lote se inserta, así un insert fallido no deja una sección
+        "Análisis - Farmer" que se duplicaría al reprocesar.
+
+        Args:
+            checkpoint_path: Ruta del checkpoint JSONL
+            workers: Número de procesos
+            write_drive: Si True, escribe el análisis en el documento de Drive
+            sf_manager: SnowflakeManager conectado, o None para no escribir en Snowflake
+            snowflake_batch_size: Análisis por transacción en Snowflake
+            drive_manager: GoogleDriveManager del proceso principal (default: se crea si hace falta)
+        """
+        self.checkpoint_path = checkpoint_path
+        self.workers = workers
+        self.write_drive = write_drive
+        self.sf_manager = sf_manager
+        self.snowflake_batch_size = snowflake_batch_size
+        self.drive_manager = drive_manager
+
+        self.counts = {"processed": 0, "skipped": 0, "errors": 0}
+        self.latencies = []
+        self._pending_sf = []
+        self._checkpoint_file = None
+
+    def _checkpoint(self, doc_info: Dict, status: str, seconds: float, error: Optional[str] = None):
+        entry = {"document_id": doc_info["document_id"], "status": status, "seconds": round(seconds, 2)}
+        if error:
+            entry["error"] = error
+        self._checkpoint_file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._checkpoint_file.flush()
+
+    def _flush_snowflake(self):
+        """Inserta en Snowflake los análisis acumulados y los marca en el checkpoint."""
+        if not self._pending_sf:
+            return
+
+        batch, self._pending_sf = self._pending_sf, []
+        records = [
+            {
+                "analysis_data": result["analysis"],
+                "document_id": result["doc_info"]["document_id"],
+                "folder_id": result["doc_info"]["folder_id"],
+                "link_documento": result["doc_info"]["document_url"],
+            }
+            for result in batch
+        ]
+
+        try:
+            self.sf_manager.insert_analyses_batch(records)
+        except Exception as e:
+            for result in batch:
+                self.counts["errors"] += 1
+                self._checkpoint(result["doc_info"], "error", result["seconds"], f"Snowflake: {e}")
+            return
+
+        for result in batch:
+            if self.write_drive:
+                try:
+                    pipeline.write_analysis(self.drive_manager, result["doc_info"], result["analysis"])
+                except Exception as e:
+                    # Snowflake ya tiene la fila; al reprocesar se reemplaza en lugar de duplicarse
+                    self.counts["errors"] += 1
+                    self._checkpoint(result["doc_info"], "error", result["seconds"], f"Drive: {e}")
+                    continue
+            self.counts["processed"] += 1
+            self._checkpoint(result["doc_info"], "processed", result["seconds"])
+
+    def _handle_result(self, result: Dict):
+        doc_info = result["doc_info"]
+        status = result["status"]
+
+        if status == "processed":
+            self.latencies.append(result["seconds"])
+            if self.sf_manager:
+                self._pending_sf.append(result)
+                if len(self._pending_sf) >= self.snowflake_batch_size:
+                    self._flush_snowflake()
+                return
+            self.counts["processed"] += 1
+        elif status == "skipped":
+            self.counts["skipped"] += 1
+        else:
+            print(f"Error procesando {doc_info.get('document_name', 'unknown')}: {result['error']}")
+            self.counts["errors"] += 1
+
+        self._checkpoint(doc_info, status, result["seconds"], result.get("error"))
+
+    def run(self, documents: List[Dict]) -> Dict:
+        """
+        Procesa los documentos y devuelve el resumen de throughput.
+
+        Args:
+            documents: Documentos del shard pendientes de procesar
+
+        Returns:
+            Dict con conteos, duración, throughput y estadísticas del analyzer sumadas entre procesos
+        """
+        started = time.monotonic()
+        worker_write_drive = self.write_drive and not self.sf_manager
+        if self.write_drive and self.sf_manager and self.drive_manager is None:
+            self.drive_manager = GoogleDriveManager()
+
+        with open(self.checkpoint_path, "a", encoding="utf-8") as self._checkpoint_file:
+            if self.workers > 1:
+                with multiprocessing.Pool(
+                    self.workers, initializer=_init_worker, initargs=(worker_write_drive,)
+                ) as pool:
+                    for result in pool.imap_unordered(_process_in_worker, documents):
+                        analyzer.merge_stats(result["stats"])
+                        self._handle_result(result)
+            else:
+                _init_worker(worker_write_drive)
+                for doc_info in documents:
+                    self._handle_result(_process_in_worker(doc_info))
+
+            self._flush_snowflake()
+
+        elapsed = time.monotonic() - started
+        latencies = sorted(self.latencies)
+        summary = dict(self.counts)
+        summary.update(
+            {
+                "total": len(documents),
+                "elapsed_seconds": round(elapsed, 1),
+                "docs_per_minute": round(len(documents) / elapsed * 60, 2) if elapsed else 0,
+                "avg_latency_seconds": round(sum(latencies) / len(latencies), 2) if latencies else 0,
+                "p95_latency_seconds": round(latencies[int(0.95 * (len(latencies) - 1))], 2) if latencies else 0,
+                "tokens": analyzer.token_usage_summary(),
+                "validation": analyzer.validation_summary(),
+                "routing": analyzer.routing_summary(),
+            }
+        )
+        return summary
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Reprocesa reuniones de Farmer Mass fuera de Airflow")
+    parser.add_argument("--folder-url", default=config.DRIVE_FOLDER_URL, help="URL de la carpeta raíz de Drive")
+    parser.add_argument("--shard", type=parse_shard, default=(0, 1), help="Partición i/n por document_id (i desde 0)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Procesos en paralelo")
+    parser.add_argument("--checkpoint", type=Path, help="Checkpoint JSONL (default: backfill_<i>_of_<n>.jsonl)")
+    parser.add_argument("--limit", type=int, help="Máximo de documentos a procesar en esta ejecución")
+    parser.add_argument("--no-drive", action="store_true", help="No escribir el análisis en Google Drive")
+    parser.add_argument("--snowflake", action="store_true", help="Insertar los análisis en Snowflake")
+    parser.add_argument("--snowflake-batch-size", type=int, default=50, help="Análisis por transacción en Snowflake")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> Dict:
+    args = build_parser().parse_args(argv)
+    shard_index, shard_total = args.shard
+    checkpoint_path = args.checkpoint or Path(f"backfill_{shard_index}_of_{shard_total}.jsonl")
+
+    drive_manager = GoogleDriveManager()
+    folder_id = drive_manager.extract_folder_id(args.folder_url)
+    if not folder_id:
+        raise ValueError(f"No se pudo extraer folder_id de: {args.folder_url}")
+
+    # Escanear y quedarse con los documentos del shard que no están en el checkpoint
+    documents = pipeline.scan_documents(drive_manager, folder_id)
+    done = load_checkpoint(checkpoint_path)
+    documents = [
+        doc
+        for doc in documents
+        if in_shard(doc["document_id"], shard_index, shard_total) and doc["document_id"] not in done
+    ]
+    if args.limit:
+        documents = documents[: args.limit]
+
+    print(
+        f"Shard {shard_index}/{shard_total}: {len(documents)} documentos pendientes "
+        f"({len(done)} ya terminados en {checkpoint_path})"
+    )
+
+    sf_manager = None
+    if args.snowflake:
+        from utils.snowflake_manager import SnowflakeManager
+
+        sf_manager = SnowflakeManager()
+        sf_manager.connect()
+        sf_manager.create_table_if_not_exists()
+
+    try:
+        runner = BackfillRunner(
+            checkpoint_path,
+            workers=max(args.workers, 1),
+            write_drive=not args.no_drive,
+            sf_manager=sf_manager,
+            snowflake_batch_size=args.snowflake_batch_size,
+            drive_manager=drive_manager,
+        )
+        summary = runner.run(documents)
+    finally:
+        if sf_manager:
+            sf_manager.close()
+
+    print("\n" + "=" * 50)
+    print("RESUMEN DE BACKFILL")
+    print("=" * 50)
+    print(f"Shard: {shard_index}/{shard_total}")
+    print(f"Total documentos: {summary['total']}")
+    print(f"Procesados: {summary['processed']}")
+    print(f"Omitidos: {summary['skipped']}")
+    print(f"Errores: {summary['errors']}")
+    print(f"Duración: {summary['elapsed_seconds']} s")
+    print(f"Throughput: {summary['docs_per_minute']} documentos/minuto")
+    print(
+        f"Latencia por documento: {summary['avg_latency_seconds']} s promedio, "
+        f"{summary['p95_latency_seconds']} s p95"
+    )
+    for mode, usage in summary["tokens"].items():
+        if usage["documents"]:
+            print(
+                f"Tokens por documento ({mode}): "
+                f"{usage['prompt_tokens_per_doc']} prompt / {usage['completion_tokens_per_doc']} completion"
+            )
+    validation = summary["validation"]
+    print(
+        f"Validación: {validation['valid']} válidas, {validation['repaired']} reparadas, "
+        f"{validation['reasked']} re-preguntadas, {validation['failed']} fallidas"
+    )
+    for route, stats in summary["routing"].items():
+        if stats["documents"]:
+            print(
+                f"Ruta {route} ({stats['model']}): {stats['documents']} documentos, "
+                f"{stats['avg_latency_seconds']} s y {stats['avg_tokens']} tokens por petición, "
+                f"escalamiento {stats['escalation_rate']:.1%}"
+            )
+    print("=" * 50)
+
+    return summary
+
+
+if __name__ == "__main__":
+    main()
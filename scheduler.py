@@ -0,0 +1,242 @@
+"""
+Scheduler de ejecuciones con presupuesto de tiempo.
+Descarta los documentos ya analizados, ordena los pendientes por prioridad, estima
+su costo a partir de la latencia reciente y deja de admitir trabajo antes del
+deadline de la ejecución. El remanente se guarda en el estado para la siguiente ejecución.
+"""
+
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import config
+
+
+# Cantidad de latencias recientes que se conservan en el estado
+LATENCY_HISTORY_SIZE = 50
+
+
+def _created_timestamp(doc_info: Dict) -> float:
+    created_time = doc_info.get("created_time")
+    if not created_time:
+        return 0.0
+    try:
+        return datetime.fromisoformat(created_time.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return 0.0
+
+
+class RunScheduler:
+    """Planificador de documentos para una ejecución con deadline."""
+
+    def __init__(
+        self,
+        deadline_seconds: Optional[float] = None,
+        state: Optional[Dict] = None,
+        clock: Callable[[], float] = time.monotonic,
+        already_elapsed: float = 0.0,
+    ):
+        """
+        Inicializa el scheduler.
+
+        Args:
+            deadline_seconds: Tiempo máximo para admitir trabajo (default: config.RUN_DEADLINE_MINUTES)
+            state: Estado persistido de la ejecución anterior (ver to_state)
+            clock: Reloj monotónico en segundos
+            already_elapsed: Segundos ya consumidos de la ejecución (p. ej. desde el inicio del DAG run)
+        """
+        state = state or {}
+        self.deadline_seconds = (
+            deadline_seconds if deadline_seconds is not None else config.RUN_DEADLINE_MINUTES * 60
+        )
+        self.retries = dict(state.get("retries", {}))
+        self.sizes = dict(state.get("sizes", {}))
+        self.latencies = list(state.get("latencies", []))[-LATENCY_HISTORY_SIZE:]
+        self.done = set(state.get("done", []))
+        self.previous_carried_over = set(state.get("carried_over", [])) - self.done
+
+        self.clock = clock
+        self.started_at = clock() - already_elapsed
+        self.carried_over = []
+        self._reserved = {}
+
+    def priority_key(self, doc_info: Dict):
+        """
+        Remanente de la ejecución anterior primero; luego más nuevo primero y, a igual
+        fecha, menos reintentos y transcripciones más cortas primero.
+        """
+        document_id = doc_info["document_id"]
+        return (
+            document_id not in self.previous_carried_over,
+            -_created_timestamp(doc_info),
+            self.retries.get(document_id, 0),
+            self.sizes.get(document_id, 0),
+        )
+
+    def pending(self, documents: List[Dict]) -> List[Dict]:
+        """
+        Filtra los documentos ya analizados en ejecuciones anteriores.
+
+        También descarta del estado los documentos que ya no aparecen en el escaneo,
+        para que el conjunto de terminados no crezca sin límite.
+
+        Args:
+            documents: Documentos devueltos por el escaneo de Drive
+
+        Returns:
+            Documentos pendientes de análisis
+        """
+        scanned_ids = {doc_info["document_id"] for doc_info in documents}
+        self.done &= scanned_ids
+        self.previous_carried_over &= scanned_ids
+        return [doc_info for doc_info in documents if doc_info["document_id"] not in self.done]
+
+    def order(self, documents: List[Dict]) -> List[Dict]:
+        """
+        Ordena los documentos pendientes por prioridad.
+
+        Args:
+            documents: Documentos devueltos por el escaneo de Drive
+
+        Returns:
+            Nueva lista ordenada
+        """
+        return sorted(documents, key=self.priority_key)
+
+    def estimate_cost(self, doc_info: Dict) -> float:
+        """
+        Estima los segundos que tomará procesar un documento.
+
+        Usa el promedio de latencias recientes, escalado por el tamaño de la
+        transcripción si se conoce de una ejecución anterior.
+
+        Args:
+            doc_info: Información del documento
+
+        Returns:
+            Segundos estimados
+        """
+        if not self.latencies:
+            return config.SCHEDULER_DEFAULT_DOC_SECONDS
+
+        avg_seconds = sum(seconds for seconds, _ in self.latencies) / len(self.latencies)
+        known_sizes = [chars for _, chars in self.latencies if chars]
+        size = self.sizes.get(doc_info["document_id"])
+
+        if not size or not known_sizes:
+            return avg_seconds
+
+        avg_chars = sum(known_sizes) / len(known_sizes)
+        return avg_seconds * max(0.5, min(size / avg_chars, 2.0))
+
+    def elapsed(self) -> float:
+        """Segundos transcurridos desde el inicio de la ejecución."""
+        return self.clock() - self.started_at
+
+    def admit(self, doc_info: Dict) -> bool:
+        """
+        Decide si un documento cabe en el tiempo restante.
+
+        Los documentos admitidos reservan su costo estimado hasta que se registra
+        su latencia real con record. Los no admitidos pasan al remanente.
+
+        Args:
+            doc_info: Información del documento
+
+        Returns:
+            True si se debe procesar en esta ejecución
+        """
+        estimate = self.estimate_cost(doc_info)
+        committed = self.elapsed() + sum(self._reserved.values())
+
+        if committed + estimate > self.deadline_seconds:
+            self.carried_over.append(doc_info["document_id"])
+            return False
+
+        self._reserved[doc_info["document_id"]] = estimate
+        return True
+
+    def in_time(self, doc_infos: List[Dict]) -> bool:
+        """
+        Verifica, justo antes de analizarlos, que documentos ya admitidos todavía caben antes del deadline.
+
+        A diferencia de admit, no cuenta las reservas de los demás documentos:
+        compara el tiempo real transcurrido más el costo estimado de estos documentos,
+        así un retraso respecto de la estimación inicial detiene el trabajo a tiempo.
+
+        Args:
+            doc_infos: Documentos que se van a analizar juntos (uno, o un lote)
+
+        Returns:
+            True si todavía se pueden procesar en esta ejecución
+        """
+        estimate = sum(self.estimate_cost(doc_info) for doc_info in doc_infos)
+        return self.elapsed() + estimate <= self.deadline_seconds
+
+    def defer(self, doc_info: Dict, transcript_chars: Optional[int] = None):
+        """
+        Pasa un documento admitido al remanente de la siguiente ejecución.
+
+        Args:
+            doc_info: Información del documento
+            transcript_chars: Tamaño de la transcripción, si ya se leyó
+        """
+        self._reserved.pop(doc_info["document_id"], None)
+        self.carried_over.append(doc_info["document_id"])
+        if transcript_chars:
+            self.sizes[doc_info["document_id"]] = transcript_chars
+
+    def record(self, doc_info: Dict, seconds: float, success: bool, transcript_chars: Optional[int] = None):
+        """
+        Registra el resultado de procesar un documento.
+
+        Args:
+            doc_info: Información del documento
+            seconds: Latencia real de lectura, análisis y escritura
+            success: Si el documento se procesó correctamente
+            transcript_chars: Tamaño de la transcripción, si se leyó
+        """
+        document_id = doc_info["document_id"]
+        self._reserved.pop(document_id, None)
+
+        if transcript_chars:
+            self.sizes[document_id] = transcript_chars
+
+        if success:
+            self.done.add(document_id)
+            self.retries.pop(document_id, None)
+            self.sizes.pop(document_id, None)
+            self.latencies = (self.latencies + [(seconds, transcript_chars or 0)])[-LATENCY_HISTORY_SIZE:]
+        else:
+            self.retries[document_id] = self.retries.get(document_id, 0) + 1
+
+    def release(self, doc_info: Dict):
+        """Libera la reserva de un documento admitido que no llegó a procesarse (p. ej. omitido)."""
+        self._reserved.pop(doc_info["document_id"], None)
+
+    def mark_done(self, doc_info: Dict):
+        """Marca como terminado un documento que ya tenía análisis (p. ej. de antes de guardar este estado)."""
+        document_id = doc_info["document_id"]
+        self.release(doc_info)
+        self.done.add(document_id)
+        self.retries.pop(document_id, None)
+        self.sizes.pop(document_id, None)
+
+    def to_state(self) -> Dict:
+        """
+        Serializa el estado para la siguiente ejecución.
+
+        Returns:
+            Dict JSON-serializable con reintentos, tamaños, latencias, remanente y terminados
+        """
+        carried_over = [doc_id for doc_id in self.carried_over if doc_id not in self.done]
+        pending_ids = set(carried_over) | set(self.retries)
+        return {
+            "retries": self.retries,
+            "sizes": {doc_id: chars for doc_id, chars in self.sizes.items() if doc_id in pending_ids},
+            "latencies": self.latencies,
+            "carried_over": carried_over,
+            "backlog": len(carried_over),
+            "done": sorted(self.done),
+            "updated_at": datetime.now().isoformat(),
+        }
@@ -46,26 +46,65 @@ CREATE TABLE IF NOT EXISTS FARMER_MASS_MEETING_ANALYSIS (
     ANALISIS_COMPLETO_JSON VARIANT
 );
 
--- Índices para mejorar performance de consultas
-CREATE INDEX IF NOT EXISTS IDX_DOCUMENT_ID ON FARMER_MASS_MEETING_ANALYSIS(DOCUMENT_ID);
-CREATE INDEX IF NOT EXISTS IDX_FARMER_NAME ON FARMER_MASS_MEETING_ANALYSIS(FARMER_NAME);
-CREATE INDEX IF NOT EXISTS IDX_FECHA_PROCESAMIENTO ON FARMER_MASS_MEETING_ANALYSIS(FECHA_PROCESAMIENTO);
+-- Snowflake no soporta CREATE INDEX en tablas estándar. Sin clustering key: las vistas leen
+-- FARMER_PERFORMANCE_SUMMARY, y el reclustering automático cobraría créditos sin acelerar
+-- ninguna consulta frecuente sobre esta tabla.
 
--- Vista para análisis agregado por Farmer
-CREATE OR REPLACE VIEW VW_FARMER_PERFORMANCE AS
-SELECT 
+-- Resumen incremental por Farmer: sumas y conteos acumulados.
+-- Se actualiza con un MERGE en la misma transacción que cada lote de inserts
+-- (SnowflakeManager.insert_analyses_batch), así el costo de las vistas no crece con la tabla.
+-- Los umbrales (>= 7 y >= 70) están en utils/performance_summary.py.
+CREATE TABLE IF NOT EXISTS FARMER_PERFORMANCE_SUMMARY (
+    FARMER_NAME VARCHAR(500) PRIMARY KEY,
+    TOTAL_REUNIONES NUMBER DEFAULT 0,
+    SUM_CLARIDAD_PITCH NUMBER DEFAULT 0,
+    SUM_NEGOCIACION NUMBER DEFAULT 0,
+    SUM_RESOLUCION_OBJECCIONES NUMBER DEFAULT 0,
+    SUM_PROBABILIDAD_CIERRE NUMBER DEFAULT 0,
+    REUNIONES_ALTA_PROBABILIDAD NUMBER DEFAULT 0,
+    HITOS_CLARIDAD_CUMPLIDOS NUMBER DEFAULT 0,
+    HITOS_NEGOCIACION_CUMPLIDOS NUMBER DEFAULT 0,
+    HITOS_RESOLUCION_CUMPLIDOS NUMBER DEFAULT 0,
+    HITOS_DECISION_MAKER_CUMPLIDOS NUMBER DEFAULT 0,
+    ULTIMA_REUNION TIMESTAMP_NTZ
+);
+
+-- Carga inicial (o reconstrucción) del resumen a partir de todos los análisis.
+-- INSERT OVERWRITE reemplaza el resumen completo, así que se puede ejecutar en cualquier momento,
+-- incluso si el DAG o el backfill ya aplicaron deltas. Misma consulta que
+-- SUMMARY_REBUILD_SELECT en utils/performance_summary.py (SnowflakeManager.rebuild_performance_summary).
+INSERT OVERWRITE INTO FARMER_PERFORMANCE_SUMMARY
+SELECT
     FARMER_NAME,
-    COUNT(*) AS TOTAL_REUNIONES,
-    AVG(CLARIDAD_PITCH) AS AVG_CLARIDAD_PITCH,
-    AVG(NEGOCIACION_HABILIDADES) AS AVG_NEGOCIACION,
-    AVG(RESOLUCION_OBJECCIONES) AS AVG_RESOLUCION_OBJECCIONES,
-    AVG(PROBABILIDAD_CIERRE) AS AVG_PROBABILIDAD_CIERRE,
-    SUM(CASE WHEN PROBABILIDAD_CIERRE >= 70 THEN 1 ELSE 0 END) AS REUNIONES_ALTA_PROBABILIDAD,
-    MAX(FECHA_PROCESAMIENTO) AS ULTIMA_REUNION
+    COUNT(*),
+    SUM(CLARIDAD_PITCH),
+    SUM(NEGOCIACION_HABILIDADES),
+    SUM(RESOLUCION_OBJECCIONES),
+    SUM(PROBABILIDAD_CIERRE),
+    SUM(CASE WHEN PROBABILIDAD_CIERRE >= 70 THEN 1 ELSE 0 END),
+    SUM(CASE WHEN CLARIDAD_PITCH >= 7 THEN 1 ELSE 0 END),
+    SUM(CASE WHEN NEGOCIACION_HABILIDADES >= 7 THEN 1 ELSE 0 END),
+    SUM(CASE WHEN RESOLUCION_OBJECCIONES >= 7 THEN 1 ELSE 0 END),
+    SUM(CASE WHEN LOWER(DECISION_MAKER_IDENTIFICADO) = 'sí' THEN 1 ELSE 0 END),
+    MAX(FECHA_PROCESAMIENTO)
 FROM FARMER_MASS_MEETING_ANALYSIS
 GROUP BY FARMER_NAME;
 
--- Vista para análisis de hitos cumplidos
+-- Vista para análisis agregado por Farmer (lee el resumen incremental)
+CREATE OR REPLACE VIEW VW_FARMER_PERFORMANCE AS
+SELECT 
+    FARMER_NAME,
+    TOTAL_REUNIONES,
+    SUM_CLARIDAD_PITCH / TOTAL_REUNIONES AS AVG_CLARIDAD_PITCH,
+    SUM_NEGOCIACION / TOTAL_REUNIONES AS AVG_NEGOCIACION,
+    SUM_RESOLUCION_OBJECCIONES / TOTAL_REUNIONES AS AVG_RESOLUCION_OBJECCIONES,
+    SUM_PROBABILIDAD_CIERRE / TOTAL_REUNIONES AS AVG_PROBABILIDAD_CIERRE,
+    REUNIONES_ALTA_PROBABILIDAD,
+    ULTIMA_REUNION
+FROM FARMER_PERFORMANCE_SUMMARY
+WHERE TOTAL_REUNIONES > 0;
+
+-- Vista para análisis de hitos cumplidos (detalle por reunión)
 CREATE OR REPLACE VIEW VW_HITOS_CUMPLIMIENTO AS
 SELECT 
     ID,
@@ -75,10 +114,23 @@ SELECT
     CLARIDAD_PITCH >= 7 AS HITO_CLARIDAD_CUMPLIDO,
     NEGOCIACION_HABILIDADES >= 7 AS HITO_NEGOCIACION_CUMPLIDO,
     RESOLUCION_OBJECCIONES >= 7 AS HITO_RESOLUCION_CUMPLIDO,
-    DECISION_MAKER_IDENTIFICADO = 'Sí' AS HITO_DECISION_MAKER_CUMPLIDO,
+    LOWER(DECISION_MAKER_IDENTIFICADO) = 'sí' AS HITO_DECISION_MAKER_CUMPLIDO,
     PROBABILIDAD_CIERRE >= 70 AS ALTA_PROBABILIDAD_CIERRE
 FROM FARMER_MASS_MEETING_ANALYSIS;
 
+-- Vista de tasa de cumplimiento de hitos por Farmer (lee el resumen incremental)
+CREATE OR REPLACE VIEW VW_HITOS_CUMPLIMIENTO_FARMER AS
+SELECT 
+    FARMER_NAME,
+    TOTAL_REUNIONES,
+    HITOS_CLARIDAD_CUMPLIDOS / TOTAL_REUNIONES AS TASA_HITO_CLARIDAD,
+    HITOS_NEGOCIACION_CUMPLIDOS / TOTAL_REUNIONES AS TASA_HITO_NEGOCIACION,
+    HITOS_RESOLUCION_CUMPLIDOS / TOTAL_REUNIONES AS TASA_HITO_RESOLUCION,
+    HITOS_DECISION_MAKER_CUMPLIDOS / TOTAL_REUNIONES AS TASA_HITO_DECISION_MAKER,
+    REUNIONES_ALTA_PROBABILIDAD / TOTAL_REUNIONES AS TASA_ALTA_PROBABILIDAD
+FROM FARMER_PERFORMANCE_SUMMARY
+WHERE TOTAL_REUNIONES > 0;
+
 -- Consulta de ejemplo: Top Farmers por desempeño
 SELECT 
     FARMER_NAME,
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Agregar path del proyecto (igual que el DAG)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,101 @@
+import json
+
+import pytest
+
+from utils.analysis_schema import ANALYSIS_FIELDS, coerce_analysis, parse_analysis, validate_analysis
+
+
+def make_analysis(**overrides):
+    analysis = {
+        "fecha_reunion": "2026-01-15",
+        "farmer_nombre": "Ana",
+        "hunter_nombre": "Juan",
+        "cliente_nombre": "La Pasta Feliz",
+        "duracion_minutos": 45,
+        "tipo_reunion": "virtual",
+        "claridad_pitch": 8,
+        "negociacion_habilidades": 7,
+        "resolucion_objecciones": 9,
+        "followup_compromisos": ["Enviar propuesta"],
+        "nivel_interes_cliente": "alto",
+        "objeciones_principales": [],
+        "necesidades_detectadas": [],
+        "decision_maker_identificado": "sí",
+        "nombre_decision_maker": "María",
+        "probabilidad_cierre": 75,
+        "next_steps": [],
+        "riesgos": [],
+        "resumen_breve": "Reunión positiva",
+        "temas_no_mencionados": [],
+    }
+    analysis.update(overrides)
+    return analysis
+
+
+def test_valid_analysis_is_not_repaired():
+    analysis, repaired, errors = parse_analysis(json.dumps(make_analysis()))
+    assert errors == []
+    assert repaired is False
+    assert analysis == make_analysis()
+
+
+def test_markdown_fence_and_trailing_comma_are_repaired():
+    raw = "```json\n" + json.dumps(make_analysis())[:-1] + ",}\n```"
+    analysis, repaired, errors = parse_analysis(raw)
+    assert errors == []
+    assert repaired is True
+    assert analysis == make_analysis()
+
+
+def test_lossless_conversions_are_repaired():
+    analysis, repaired, errors = coerce_analysis(
+        make_analysis(
+            claridad_pitch=" 8 ",
+            probabilidad_cierre=75.0,
+            nivel_interes_cliente="Muy alto",
+            decision_maker_identificado="Si",
+            riesgos="Competencia local",
+        )
+    )
+    assert errors == []
+    assert repaired is True
+    assert analysis["claridad_pitch"] == 8
+    assert analysis["probabilidad_cierre"] == 75
+    assert analysis["nivel_interes_cliente"] == "muy_alto"
+    assert analysis["decision_maker_identificado"] == "sí"
+    assert analysis["riesgos"] == ["Competencia local"]
+
+
+@pytest.mark.parametrize(
+    "field, value",
+    [
+        ("claridad_pitch", 15),
+        ("probabilidad_cierre", 750),
+        ("probabilidad_cierre", 0.75),
+        ("negociacion_habilidades", "de 0 a 10: 7"),
+        ("duracion_minutos", "1 hora 30 minutos"),
+        ("nivel_interes_cliente", "regular"),
+    ],
+)
+def test_lossy_values_are_errors_not_repairs(field, value):
+    analysis, repaired, errors = coerce_analysis(make_analysis(**{field: value}))
+    assert analysis is None
+    assert len(errors) == 1 and errors[0].startswith(field)
+
+
+def test_missing_optional_fields_get_defaults_but_key_scores_do_not():
+    data = make_analysis()
+    del data["riesgos"]
+    analysis, repaired, errors = coerce_analysis(data)
+    assert repaired is True
+    assert analysis["riesgos"] == ANALYSIS_FIELDS["riesgos"]["default"]
+
+    data = make_analysis()
+    del data["claridad_pitch"]
+    analysis, _, errors = coerce_analysis(data)
+    assert analysis is None
+    assert errors == ["claridad_pitch: campo faltante"]
+
+
+def test_validate_analysis_reports_out_of_range():
+    assert validate_analysis(make_analysis(claridad_pitch=11)) == ["claridad_pitch: fuera de rango [0, 10]"]
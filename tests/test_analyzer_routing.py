@@ -0,0 +1,136 @@
+import json
+
+import pytest
+
+import analyzer
+import config
+
+from test_analysis_schema import make_analysis
+
+SHORT = "x" * 200
+LONG = "x" * (config.ROUTE_FAST_MAX_CHARS + 100)
+
+
+@pytest.fixture(autouse=True)
+def reset_stats(monkeypatch):
+    monkeypatch.setattr(analyzer, "load_system_prompt", lambda: "system")
+    monkeypatch.setattr(analyzer, "load_batch_instructions", lambda: "batch")
+    for stats in analyzer.ROUTING_STATS.values():
+        for key in stats:
+            stats[key] = 0
+    for key in analyzer.VALIDATION_STATS:
+        analyzer.VALIDATION_STATS[key] = 0
+
+
+def fake_completion(monkeypatch, outputs_by_model):
+    """Sustituye _chat_completion por respuestas fijas por modelo y registra los modelos llamados."""
+    calls = []
+
+    def chat_completion(messages, max_tokens, timeout, model=None, **_):
+        calls.append(model)
+        return outputs_by_model[model], {"total_tokens": 10}
+
+    monkeypatch.setattr(analyzer, "_chat_completion", chat_completion)
+    return calls
+
+
+def test_select_route():
+    assert analyzer.select_route(SHORT) == "fast"
+    assert analyzer.select_route(LONG) == "default"
+
+
+def test_zero_scores_escalate_only_when_enabled(monkeypatch):
+    zero_scores = make_analysis(claridad_pitch=0, negociacion_habilidades=0, resolucion_objecciones=0)
+
+    monkeypatch.setattr(config, "ESCALATE_ON_ZERO_SCORES", False)
+    assert not analyzer._needs_escalation(zero_scores, [], LONG)
+    assert analyzer._needs_escalation(None, ["claridad_pitch: campo faltante"], LONG)
+
+    monkeypatch.setattr(config, "ESCALATE_ON_ZERO_SCORES", True)
+    assert analyzer._needs_escalation(zero_scores, [], LONG)
+    assert not analyzer._needs_escalation(zero_scores, [], SHORT)
+
+
+def test_invalid_output_escalates_to_strong(monkeypatch, capsys):
+    calls = fake_completion(
+        monkeypatch,
+        {config.ROUTES["fast"]["model"]: "no es json", config.ROUTES["strong"]["model"]: json.dumps(make_analysis())},
+    )
+
+    result = analyzer.analyze_transcription(SHORT, verbose=False)
+
+    assert result["farmer_nombre"] == "Ana"
+    assert calls == [config.ROUTES["fast"]["model"], config.ROUTES["strong"]["model"]]
+    assert analyzer.ROUTING_STATS["fast"]["escalations"] == 1
+    # El error solo se reporta si también falla la ruta final
+    assert "ERROR VALIDANDO JSON" not in capsys.readouterr().out
+
+
+def test_batch_uses_route_model_and_retries_missing_on_strong(monkeypatch):
+    batch_output = json.dumps({"analisis": [{"document_id": "a", "resultado": make_analysis()}]})
+    calls = fake_completion(
+        monkeypatch,
+        {config.ROUTES["fast"]["model"]: batch_output, config.ROUTES["strong"]["model"]: json.dumps(make_analysis())},
+    )
+
+    documents = [{"document_id": "a", "transcription": SHORT}, {"document_id": "b", "transcription": SHORT}]
+    results, errors = analyzer.analyze_transcriptions_batch(documents, batch_size=2)
+
+    assert set(results) == {"a", "b"} and not errors
+    assert calls == [config.ROUTES["fast"]["model"], config.ROUTES["strong"]["model"]]
+    assert analyzer.ROUTING_STATS["fast"]["escalations"] == 1
+
+
+def test_failed_batch_retries_on_normal_route_without_escalating(monkeypatch):
+    fast_model = config.ROUTES["fast"]["model"]
+    calls = []
+
+    def chat_completion(messages, max_tokens, timeout, model=None, **_):
+        calls.append(model)
+        if len(calls) == 1:
+            raise Exception(f"TIMEOUT: La API tardó más de {timeout} segundos")
+        return json.dumps(make_analysis()), {"total_tokens": 10}
+
+    monkeypatch.setattr(analyzer, "_chat_completion", chat_completion)
+
+    documents = [{"document_id": str(i), "transcription": SHORT} for i in range(5)]
+    results, errors = analyzer.analyze_transcriptions_batch(documents, batch_size=5)
+
+    assert len(results) == 5 and not errors
+    assert calls == [fast_model] * 6
+    assert analyzer.ROUTING_STATS["fast"]["requests"] == 6
+    assert analyzer.ROUTING_STATS["fast"]["escalations"] == 0
+    assert analyzer.ROUTING_STATS["strong"]["requests"] == 0
+
+
+def test_batch_output_tokens_are_capped(monkeypatch):
+    monkeypatch.setattr(config, "BATCH_MAX_OUTPUT_TOKENS", 2000)
+    max_tokens_seen = []
+
+    def chat_completion(messages, max_tokens, timeout, model=None, **_):
+        max_tokens_seen.append(max_tokens)
+        lines = messages[1]["content"].splitlines()
+        ids = [line.split()[-1] for line in lines if line.startswith("### DOCUMENTO")]
+        if not ids:
+            return json.dumps(make_analysis()), {}
+        return json.dumps({"analisis": [{"document_id": i, "resultado": make_analysis()} for i in ids]}), {}
+
+    monkeypatch.setattr(analyzer, "_chat_completion", chat_completion)
+
+    documents = [{"document_id": str(i), "transcription": SHORT} for i in range(5)]
+    results, _ = analyzer.analyze_transcriptions_batch(documents, batch_size=5)
+
+    assert len(results) == 5
+    # 2000 // MAX_TOKENS (800) = lotes de a 2
+    assert max_tokens_seen == [1600, 1600, config.MAX_TOKENS]
+
+
+def test_configure_routes(monkeypatch):
+    monkeypatch.setattr(config, "ROUTES", {route: dict(spec) for route, spec in config.ROUTES.items()})
+    default_model = config.ROUTES["default"]["model"]
+
+    analyzer.configure_routes(fast_model="nano", strong_model="big")
+
+    assert config.ROUTES["fast"]["model"] == "nano"
+    assert config.ROUTES["strong"]["model"] == "big"
+    assert config.ROUTES["default"]["model"] == default_model
@@ -0,0 +1,103 @@
+import pipeline
+from utils.google_drive_manager import GoogleDriveManager
+
+
+class FakeRequest:
+    def __init__(self, response):
+        self.response = response
+
+    def execute(self):
+        return self.response
+
+
+class FakeFiles:
+    """Simula files().list de la Drive API devolviendo una página por llamada."""
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.calls = []
+
+    def list(self, **kwargs):
+        self.calls.append(kwargs)
+        index = int(kwargs.get("pageToken") or 0)
+        response = {"files": self.pages[index]}
+        if index + 1 < len(self.pages):
+            response["nextPageToken"] = str(index + 1)
+        return FakeRequest(response)
+
+
+class FakeDriveService:
+    def __init__(self, files):
+        self._files = files
+
+    def files(self):
+        return self._files
+
+
+def test_list_folders_follows_next_page_token():
+    pages = [[{"id": f"f{page}-{i}", "name": "Reunión"} for i in range(3)] for page in range(3)]
+    files = FakeFiles(pages)
+
+    manager = GoogleDriveManager.__new__(GoogleDriveManager)
+    manager.drive_service = FakeDriveService(files)
+
+    folders = manager.list_folders("root")
+
+    assert len(folders) == 9
+    assert [call.get("pageToken") for call in files.calls] == [None, "1", "2"]
+
+
+class FakeDocuments:
+    """Simula documents().get/batchUpdate de la Docs API."""
+
+    def __init__(self, document):
+        self.document = document
+        self.updates = []
+
+    def get(self, documentId):
+        return FakeRequest(self.document)
+
+    def batchUpdate(self, documentId, body):
+        self.updates.append(body["requests"])
+        return FakeRequest({})
+
+
+class FakeDocsService:
+    def __init__(self, documents):
+        self._documents = documents
+
+    def documents(self):
+        return self._documents
+
+
+def make_document(paragraphs):
+    """Arma un cuerpo de Docs con un textRun por párrafo, con índices desde 1."""
+    content = []
+    index = 1
+    for text in paragraphs:
+        end = index + len(text.encode("utf-16-le")) // 2
+        content.append(
+            {
+                "startIndex": index,
+                "endIndex": end,
+                "paragraph": {"elements": [{"startIndex": index, "endIndex": end, "textRun": {"content": text}}]},
+            }
+        )
+        index = end
+    return {"body": {"content": content}}
+
+
+def test_replace_document_section_deletes_previous_section():
+    section = ["\n", "\n", f"--- {pipeline.ANALYSIS_SECTION_TITLE} ---\n", "\n", "{\n", '  "a": "ñ 😀"\n', "}\n"]
+    transcript = ["Transcripción de la reunión\n"]
+    documents = FakeDocuments(make_document(section + transcript))
+
+    manager = GoogleDriveManager.__new__(GoogleDriveManager)
+    manager.docs_service = FakeDocsService(documents)
+    manager.replace_document_section("doc", pipeline.ANALYSIS_SECTION_TITLE, "{}", pipeline.ANALYSIS_SECTION_RE)
+
+    requests = documents.updates[0]
+    transcript_start = documents.document["body"]["content"][len(section)]["startIndex"]
+    assert requests[0] == {"deleteContentRange": {"range": {"startIndex": 1, "endIndex": transcript_start}}}
+    assert requests[1]["insertText"]["location"] == {"index": 1}
+    assert len(requests) == 2
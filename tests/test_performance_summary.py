@@ -0,0 +1,151 @@
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+from utils.performance_summary import (
+    SUMMARY_COUNTERS,
+    SUMMARY_REBUILD_SELECT,
+    apply_performance_deltas,
+    compute_performance_deltas,
+)
+
+# Stand-in local de las columnas de FARMER_MASS_MEETING_ANALYSIS que usa el resumen
+CREATE_ANALYSIS_SQL = """
+CREATE TABLE FARMER_MASS_MEETING_ANALYSIS (
+    FARMER_NAME TEXT,
+    CLARIDAD_PITCH INTEGER,
+    NEGOCIACION_HABILIDADES INTEGER,
+    RESOLUCION_OBJECCIONES INTEGER,
+    PROBABILIDAD_CIERRE INTEGER,
+    DECISION_MAKER_IDENTIFICADO TEXT,
+    FECHA_PROCESAMIENTO TEXT
+)
+"""
+
+BATCH_1 = [
+    ("Ana", 8, 7, 9, 75, "sí"),
+    ("Ana", 3, 5, 6, 40, "no"),
+    ("Luis", 7, 7, 7, 70, "Sí"),
+]
+BATCH_2 = [
+    ("Ana", 10, 2, 0, 90, "sí"),
+    ("Carla", 0, 0, 0, 0, "no"),
+]
+
+
+def as_analysis(row):
+    farmer, claridad, negociacion, resolucion, probabilidad, decision_maker = row
+    return {
+        "farmer_nombre": farmer,
+        "claridad_pitch": claridad,
+        "negociacion_habilidades": negociacion,
+        "resolucion_objecciones": resolucion,
+        "probabilidad_cierre": probabilidad,
+        "decision_maker_identificado": decision_maker,
+    }
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.execute(CREATE_ANALYSIS_SQL)
+    counter_columns = ", ".join(f"{column} INTEGER" for column in SUMMARY_COUNTERS)
+    conn.execute(
+        "CREATE TABLE FARMER_PERFORMANCE_SUMMARY "
+        f"(FARMER_NAME TEXT PRIMARY KEY, {counter_columns}, ULTIMA_REUNION TEXT)"
+    )
+    yield conn
+    conn.close()
+
+
+def insert_batch(conn, rows, processed_at):
+    conn.executemany(
+        "INSERT INTO FARMER_MASS_MEETING_ANALYSIS VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [row + (processed_at.isoformat(),) for row in rows],
+    )
+
+
+def rebuild(conn):
+    cursor = conn.execute(SUMMARY_REBUILD_SELECT)
+    columns = [description[0] for description in cursor.description]
+    return {row[0]: dict(zip(columns[1:], row[1:])) for row in cursor.fetchall()}
+
+
+def merge_deltas(conn, deltas):
+    """Equivalente sqlite del MERGE de SnowflakeManager._merge_performance_deltas."""
+    columns = ", ".join(SUMMARY_COUNTERS)
+    placeholders = ", ".join("?" for _ in SUMMARY_COUNTERS)
+    update_set = ", ".join(f"{column} = {column} + excluded.{column}" for column in SUMMARY_COUNTERS)
+    for farmer_name, delta in deltas.items():
+        conn.execute(
+            f"INSERT INTO FARMER_PERFORMANCE_SUMMARY (FARMER_NAME, {columns}, ULTIMA_REUNION) "
+            f"VALUES (?, {placeholders}, ?) ON CONFLICT(FARMER_NAME) DO UPDATE SET {update_set}, "
+            "ULTIMA_REUNION = MAX(COALESCE(ULTIMA_REUNION, excluded.ULTIMA_REUNION), "
+            "COALESCE(excluded.ULTIMA_REUNION, ULTIMA_REUNION))",
+            [farmer_name]
+            + [delta[column] for column in SUMMARY_COUNTERS]
+            + [delta["ULTIMA_REUNION"] and delta["ULTIMA_REUNION"].isoformat()],
+        )
+
+
+def read_summary(conn):
+    cursor = conn.execute("SELECT * FROM FARMER_PERFORMANCE_SUMMARY")
+    columns = [description[0] for description in cursor.description]
+    return {row[0]: dict(zip(columns[1:], row[1:])) for row in cursor.fetchall()}
+
+
+def test_incremental_deltas_match_full_rebuild(conn):
+    first, second = datetime(2026, 1, 1, 8), datetime(2026, 1, 1, 12)
+
+    # Carga inicial con el primer lote, luego un lote incremental por MERGE
+    insert_batch(conn, BATCH_1, first)
+    conn.execute(f"INSERT INTO FARMER_PERFORMANCE_SUMMARY {SUMMARY_REBUILD_SELECT}")
+    insert_batch(conn, BATCH_2, second)
+    merge_deltas(conn, compute_performance_deltas([as_analysis(row) for row in BATCH_2], second))
+
+    assert read_summary(conn) == rebuild(conn)
+
+
+def test_in_memory_merge_matches_full_rebuild(conn):
+    first, second = datetime(2026, 1, 1, 8), datetime(2026, 1, 1, 12)
+    insert_batch(conn, BATCH_1, first)
+    insert_batch(conn, BATCH_2, second)
+
+    summary = apply_performance_deltas({}, compute_performance_deltas([as_analysis(row) for row in BATCH_1], first))
+    apply_performance_deltas(summary, compute_performance_deltas([as_analysis(row) for row in BATCH_2], second))
+
+    expected = rebuild(conn)
+    for row in summary.values():
+        row["ULTIMA_REUNION"] = row["ULTIMA_REUNION"].isoformat()
+    assert summary == expected
+    assert expected["Ana"]["TOTAL_REUNIONES"] == 3
+    assert expected["Luis"]["HITOS_DECISION_MAKER_CUMPLIDOS"] == 1
+
+
+def test_replaced_rows_are_subtracted(conn):
+    first, second = datetime(2026, 1, 1, 8), datetime(2026, 1, 1, 12)
+    insert_batch(conn, BATCH_1, first)
+    conn.execute(f"INSERT INTO FARMER_PERFORMANCE_SUMMARY {SUMMARY_REBUILD_SELECT}")
+
+    # Reprocesar la segunda reunión de Ana: se borra la fila anterior y se inserta la nueva
+    old_row, new_row = BATCH_1[1], ("Ana", 9, 8, 7, 80, "sí")
+    conn.execute("DELETE FROM FARMER_MASS_MEETING_ANALYSIS WHERE FARMER_NAME = 'Ana' AND CLARIDAD_PITCH = 3")
+    insert_batch(conn, [new_row], second)
+    merge_deltas(conn, compute_performance_deltas([as_analysis(new_row)], second, [as_analysis(old_row)]))
+
+    summary = read_summary(conn)
+    assert summary == rebuild(conn)
+    assert summary["Ana"]["TOTAL_REUNIONES"] == 2
+
+
+def test_replacement_without_new_rows_keeps_last_meeting():
+    first = datetime(2026, 1, 1, 8)
+    summary = apply_performance_deltas({}, compute_performance_deltas([as_analysis(row) for row in BATCH_1], first))
+
+    deltas = compute_performance_deltas([], replaced=[as_analysis(BATCH_1[2])])
+    assert deltas["Luis"]["ULTIMA_REUNION"] is None
+
+    apply_performance_deltas(summary, deltas)
+    assert summary["Luis"]["TOTAL_REUNIONES"] == 0
+    assert summary["Luis"]["ULTIMA_REUNION"] == first
@@ -0,0 +1,37 @@
+import json
+
+import pipeline
+
+TRANSCRIPT = "Farmer: Hola, ¿cómo va el restaurante? " * 10
+
+
+def previous_section(analysis):
+    # Mismo texto que GoogleDriveManager inserta al inicio del cuerpo
+    return f"\n\n--- {pipeline.ANALYSIS_SECTION_TITLE} ---\n\n{json.dumps(analysis, indent=2, ensure_ascii=False)}\n"
+
+
+class FakeDriveManager:
+    def __init__(self, content):
+        self.content = content
+
+    def read_document_content(self, document_id):
+        return self.content
+
+
+def test_read_transcription_skips_previous_analysis_sections():
+    analysis = {"farmer_nombre": "Ana", "next_steps": ["Enviar {propuesta}"], "riesgos": []}
+    content = previous_section(analysis) + previous_section({"farmer_nombre": "Ana"}) + TRANSCRIPT
+
+    assert pipeline.read_transcription(FakeDriveManager(content), {"document_id": "d"}) == TRANSCRIPT
+
+
+def test_read_transcription_without_sections_is_unchanged():
+    assert pipeline.read_transcription(FakeDriveManager(TRANSCRIPT), {"document_id": "d"}) == TRANSCRIPT
+    assert pipeline.read_transcription(FakeDriveManager(""), {"document_id": "d"}) is None
+
+
+def test_read_document_reports_previous_analysis():
+    content = previous_section({"farmer_nombre": "Ana"}) + TRANSCRIPT
+
+    assert pipeline.read_document(FakeDriveManager(content), {"document_id": "d"}) == (TRANSCRIPT, True)
+    assert pipeline.read_document(FakeDriveManager(TRANSCRIPT), {"document_id": "d"}) == (TRANSCRIPT, False)
@@ -0,0 +1,105 @@
+import argparse
+import io
+import json
+
+import pytest
+
+import analyzer
+import run_backfill
+from run_backfill import BackfillRunner, in_shard, load_checkpoint, parse_shard
+
+
+def test_parse_shard():
+    assert parse_shard("0/4") == (0, 4)
+    assert parse_shard("3/4") == (3, 4)
+    for value in ("4/4", "-1/4", "0/0", "1", "a/b"):
+        with pytest.raises(argparse.ArgumentTypeError):
+            parse_shard(value)
+
+
+def test_in_shard_assigns_each_document_to_exactly_one_shard():
+    document_ids = [f"doc-{i}" for i in range(200)]
+    counts = [sum(in_shard(doc_id, index, 4) for doc_id in document_ids) for index in range(4)]
+
+    assert sum(counts) == len(document_ids)
+    assert all(counts)
+    assert all(in_shard(doc_id, 0, 1) for doc_id in document_ids)
+
+
+def test_load_checkpoint(tmp_path):
+    path = tmp_path / "checkpoint.jsonl"
+    assert load_checkpoint(path) == set()
+
+    path.write_text(
+        "\n".join(
+            [
+                json.dumps({"document_id": "a", "status": "processed"}),
+                json.dumps({"document_id": "b", "status": "skipped"}),
+                json.dumps({"document_id": "c", "status": "error"}),
+                '{"document_id": "d", "sta',
+            ]
+        ),
+        encoding="utf-8",
+    )
+    assert load_checkpoint(path) == {"a", "b"}
+
+
+class FakeSnowflake:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.batches = []
+
+    def insert_analyses_batch(self, records):
+        if self.fail:
+            raise RuntimeError("timeout")
+        self.batches.append(records)
+        return True
+
+
+def make_result(document_id):
+    doc_info = {"document_id": document_id, "folder_id": "f", "document_url": f"https://docs/{document_id}"}
+    return {"status": "processed", "analysis": {"farmer_nombre": "Ana"}, "doc_info": doc_info, "seconds": 1.0}
+
+
+def flush(runner, results):
+    runner._checkpoint_file = io.StringIO()
+    for result in results:
+        runner._handle_result(result)
+    runner._flush_snowflake()
+    return [json.loads(line) for line in runner._checkpoint_file.getvalue().splitlines()]
+
+
+def test_drive_is_written_only_after_snowflake_insert(monkeypatch, tmp_path):
+    written = []
+    monkeypatch.setattr(run_backfill.pipeline, "write_analysis", lambda _, doc_info, __: written.append(doc_info))
+
+    failing = BackfillRunner(tmp_path / "c.jsonl", sf_manager=FakeSnowflake(fail=True), drive_manager=object())
+    entries = flush(failing, [make_result("a"), make_result("b")])
+    assert [entry["status"] for entry in entries] == ["error", "error"]
+    assert written == []
+
+    runner = BackfillRunner(tmp_path / "c.jsonl", sf_manager=FakeSnowflake(), drive_manager=object())
+    entries = flush(runner, [make_result("a"), make_result("b")])
+    assert [entry["status"] for entry in entries] == ["processed", "processed"]
+    assert [doc_info["document_id"] for doc_info in written] == ["a", "b"]
+    assert len(runner.sf_manager.batches) == 1
+
+
+def test_worker_stats_are_returned_and_merged(monkeypatch):
+    def process_document(drive_manager, doc_info, write_drive=True):
+        analyzer.VALIDATION_STATS["valid"] += 1
+        analyzer.TOKEN_STATS["single"]["prompt_tokens"] += 120
+        analyzer.ROUTING_STATS["fast"]["latency_seconds"] += 1.5
+        return {"status": "processed", "analysis": {}, "transcript_chars": 500}
+
+    monkeypatch.setattr(run_backfill.pipeline, "process_document", process_document)
+    before = analyzer.stats_snapshot()
+
+    result = run_backfill._process_in_worker({"document_id": "a"})
+    assert result["stats"]["validation"]["valid"] == 1
+    assert result["stats"]["tokens"]["single"]["prompt_tokens"] == 120
+    assert result["stats"]["routing"]["fast"]["latency_seconds"] == 1.5
+
+    # En el proceso principal se suman los incrementos de cada worker
+    analyzer.merge_stats(result["stats"])
+    assert analyzer.stats_since(before)["validation"]["valid"] == 2
@@ -0,0 +1,100 @@
+from scheduler import RunScheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_docs(count):
+    # d0 es el más antiguo, d{count-1} el más nuevo
+    return [{"document_id": f"d{i}", "created_time": f"2026-01-{i + 1:02d}T00:00:00Z"} for i in range(count)]
+
+
+def run_once(documents, state, docs_per_run, seconds_per_doc=10.0):
+    """Simula una ejecución que procesa documentos de seconds_per_doc hasta el deadline."""
+    clock = FakeClock()
+    scheduler = RunScheduler(deadline_seconds=docs_per_run * seconds_per_doc, state=state, clock=clock)
+    processed = []
+    for doc_info in scheduler.order(scheduler.pending(documents)):
+        if not scheduler.admit(doc_info):
+            continue
+        clock.now += seconds_per_doc
+        scheduler.record(doc_info, seconds_per_doc, success=True)
+        processed.append(doc_info["document_id"])
+    return processed, scheduler.to_state()
+
+
+def test_newest_first_with_fewer_retries_and_smaller_size_as_tiebreakers():
+    scheduler = RunScheduler(state={"retries": {"b": 2}, "sizes": {"c": 5000, "d": 100}})
+    docs = [
+        {"document_id": "a", "created_time": "2026-01-01T00:00:00Z"},
+        {"document_id": "b", "created_time": "2026-01-02T00:00:00Z"},
+        {"document_id": "c", "created_time": "2026-01-02T00:00:00Z"},
+        {"document_id": "d", "created_time": "2026-01-02T00:00:00Z"},
+    ]
+    assert [doc["document_id"] for doc in scheduler.order(docs)] == ["d", "c", "b", "a"]
+
+
+def test_deferred_documents_are_picked_up_first_on_next_run():
+    documents = make_docs(10)
+
+    first, state = run_once(documents, {"latencies": [[10.0, 0]]}, docs_per_run=5)
+    assert first == ["d9", "d8", "d7", "d6", "d5"]
+    assert sorted(state["carried_over"]) == ["d0", "d1", "d2", "d3", "d4"]
+    assert state["backlog"] == 5
+
+    second, state = run_once(documents, state, docs_per_run=5)
+    assert sorted(second) == ["d0", "d1", "d2", "d3", "d4"]
+    # Los documentos de la primera ejecución ya están terminados: no vuelven al remanente
+    assert state["carried_over"] == []
+    assert state["backlog"] == 0
+
+    third, state = run_once(documents, state, docs_per_run=5)
+    assert third == []
+
+
+def test_new_documents_are_the_only_pending_ones():
+    documents = make_docs(4)
+    _, state = run_once(documents, {"latencies": [[10.0, 0]]}, docs_per_run=10)
+
+    new_documents = documents + [{"document_id": "d9", "created_time": "2026-02-01T00:00:00Z"}]
+    processed, state = run_once(new_documents, state, docs_per_run=10)
+    assert processed == ["d9"]
+    assert state["done"] == ["d0", "d1", "d2", "d3", "d9"]
+
+
+def test_mark_done_and_pruning_of_documents_no_longer_scanned():
+    scheduler = RunScheduler(state={"done": ["gone"], "carried_over": ["a", "gone"], "retries": {"a": 1}})
+    docs = make_docs(2)
+
+    assert scheduler.pending([{"document_id": "a"}] + docs) == [{"document_id": "a"}] + docs
+    scheduler.mark_done({"document_id": "a"})
+
+    state = scheduler.to_state()
+    assert state["done"] == ["a"]
+    assert state["retries"] == {}
+
+
+def test_in_time_defers_when_real_latency_exceeds_estimate():
+    clock = FakeClock()
+    scheduler = RunScheduler(deadline_seconds=60, state={"latencies": [[10.0, 0]]}, clock=clock)
+    docs = make_docs(4)
+    assert all(scheduler.admit(doc) for doc in docs)
+
+    # El primer documento tarda mucho más de lo estimado
+    clock.now = 55
+    assert not scheduler.in_time([docs[1]])
+    scheduler.defer(docs[1], transcript_chars=3000)
+
+    state = scheduler.to_state()
+    assert state["carried_over"] == ["d1"]
+    assert state["sizes"] == {"d1": 3000}
+
+
+def test_deadline_counts_time_already_elapsed_in_the_dag_run():
+    scheduler = RunScheduler(deadline_seconds=100, already_elapsed=95, clock=FakeClock())
+    assert not scheduler.admit({"document_id": "x"})
@@ -0,0 +1,60 @@
+from utils.snowflake_manager import SnowflakeManager
+
+from test_analysis_schema import make_analysis
+
+
+class FakeCursor:
+    def __init__(self, existing_rows):
+        self.existing_rows = existing_rows
+        self.statements = []
+
+    def execute(self, sql, params=None):
+        self.statements.append((" ".join(sql.split()), params))
+
+    def fetchall(self):
+        return self.existing_rows
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.committed = False
+
+    def cursor(self):
+        return self._cursor
+
+    def commit(self):
+        self.committed = True
+
+    def rollback(self):
+        pass
+
+
+def record(document_id, **overrides):
+    return {
+        "analysis_data": make_analysis(**overrides),
+        "document_id": document_id,
+        "folder_id": "folder",
+        "link_documento": f"https://docs/{document_id}",
+    }
+
+
+def test_reprocessed_document_replaces_previous_row():
+    # Fila anterior de doc-1: Ana, puntajes 3/5/6, probabilidad 40
+    cursor = FakeCursor([("Ana", 3, 5, 6, 40, "no")])
+    manager = SnowflakeManager()
+    manager.conn = FakeConnection(cursor)
+
+    manager.insert_analyses_batch([record("doc-1", claridad_pitch=3), record("doc-1")])
+
+    statements = [sql.split()[0] for sql, _ in cursor.statements]
+    assert statements == ["BEGIN", "SELECT", "DELETE", "INSERT", "MERGE"]
+    assert cursor.statements[2][1] == ("doc-1",)
+
+    merge_params = cursor.statements[4][1]
+    # Una reunión nueva menos una reemplazada: el total no cambia y las sumas llevan la diferencia
+    assert merge_params[:4] == ("Ana", 0, 8 - 3, 7 - 5)
+    assert manager.conn.committed
@@ -0,0 +1,298 @@
+"""
+Esquema tipado del análisis de reuniones.
+Compartido por el analizador (validación de la respuesta del LLM) y por
+SnowflakeManager (mapeo de campos a columnas).
+"""
+
+import json
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    import orjson
+
+    def _loads(text: str):
+        return orjson.loads(text)
+
+except ImportError:  # pragma: no cover - orjson es opcional
+    _loads = json.loads
+
+
+NO_MENCIONADO = "No mencionado"
+
+NIVELES_INTERES = ["muy_alto", "alto", "medio", "bajo", "muy_bajo", NO_MENCIONADO]
+DECISION_MAKER_VALUES = ["sí", "no"]
+
+# Campo del JSON -> definición (tipo, rango, default y columna en Snowflake)
+ANALYSIS_FIELDS = {
+    "fecha_reunion": {"type": "string", "default": NO_MENCIONADO, "column": "FECHA_REUNION"},
+    "farmer_nombre": {"type": "string", "default": NO_MENCIONADO, "column": "FARMER_NAME"},
+    "hunter_nombre": {"type": "string", "default": NO_MENCIONADO, "column": "HUNTER_NAME"},
+    "cliente_nombre": {"type": "string", "default": NO_MENCIONADO, "column": "ALIADO_NAME"},
+    "duracion_minutos": {"type": "integer", "min": 0, "max": 1440, "default": 0, "column": "DURACION_MINUTOS"},
+    "tipo_reunion": {"type": "string", "default": NO_MENCIONADO, "column": "TIPO_REUNION"},
+    "claridad_pitch": {"type": "integer", "min": 0, "max": 10, "column": "CLARIDAD_PITCH"},
+    "negociacion_habilidades": {"type": "integer", "min": 0, "max": 10, "column": "NEGOCIACION_HABILIDADES"},
+    "resolucion_objecciones": {"type": "integer", "min": 0, "max": 10, "column": "RESOLUCION_OBJECCIONES"},
+    "followup_compromisos": {"type": "array", "default": [], "column": "FOLLOWUP_COMPROMISOS"},
+    "nivel_interes_cliente": {
+        "type": "string",
+        "enum": NIVELES_INTERES,
+        "default": NO_MENCIONADO,
+        "column": "NIVEL_INTERES_CLIENTE",
+    },
+    "objeciones_principales": {"type": "array", "default": [], "column": "OBJECIONES_PRINCIPALES"},
+    "necesidades_detectadas": {"type": "array", "default": [], "column": "NECESIDADES_DETECTADAS"},
+    "decision_maker_identificado": {
+        "type": "string",
+        "enum": DECISION_MAKER_VALUES,
+        "default": "no",
+        "column": "DECISION_MAKER_IDENTIFICADO",
+    },
+    "nombre_decision_maker": {"type": "string", "default": NO_MENCIONADO, "column": "NOMBRE_DECISION_MAKER"},
+    "probabilidad_cierre": {"type": "integer", "min": 0, "max": 100, "column": "PROBABILIDAD_CIERRE"},
+    "next_steps": {"type": "array", "default": [], "column": "NEXT_STEPS"},
+    "riesgos": {"type": "array", "default": [], "column": "RIESGOS"},
+    "resumen_breve": {"type": "string", "default": NO_MENCIONADO, "column": "RESUMEN_BREVE"},
+    "temas_no_mencionados": {"type": "array", "default": [], "column": "TEMAS_NO_MENCIONADOS"},
+}
+
+# Scores sin default: si faltan, el análisis no es válido y se vuelve a pedir
+KEY_SCORE_FIELDS = [name for name, spec in ANALYSIS_FIELDS.items() if "default" not in spec]
+
+
+def _json_schema_property(spec: Dict) -> Dict:
+    if spec["type"] == "array":
+        return {"type": "array", "items": {"type": "string"}}
+    prop = {"type": spec["type"]}
+    if "enum" in spec:
+        prop["enum"] = spec["enum"]
+    return prop
+
+
+# JSON Schema para response_format (modo strict: todos los campos requeridos)
+ANALYSIS_JSON_SCHEMA = {
+    "type": "object",
+    "properties": {name: _json_schema_property(spec) for name, spec in ANALYSIS_FIELDS.items()},
+    "required": list(ANALYSIS_FIELDS),
+    "additionalProperties": False,
+}
+
+BATCH_JSON_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "analisis": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {"document_id": {"type": "string"}, "resultado": ANALYSIS_JSON_SCHEMA},
+                "required": ["document_id", "resultado"],
+                "additionalProperties": False,
+            },
+        }
+    },
+    "required": ["analisis"],
+    "additionalProperties": False,
+}
+
+
+def response_format(schema: Dict, name: str) -> Dict:
+    """Construye el parámetro response_format en modo JSON Schema."""
+    return {"type": "json_schema", "json_schema": {"name": name, "strict": True, "schema": schema}}
+
+
+def _compile_checker(name: str, spec: Dict) -> Callable[[object], Optional[str]]:
+    """Precompila la validación de un campo para no interpretar el spec en cada llamada."""
+    field_type = spec["type"]
+
+    if field_type == "integer":
+        low, high = spec["min"], spec["max"]
+
+        def check(value):
+            if isinstance(value, bool) or not isinstance(value, int):
+                return f"{name}: se esperaba entero"
+            if not low <= value <= high:
+                return f"{name}: fuera de rango [{low}, {high}]"
+            return None
+
+    elif field_type == "array":
+
+        def check(value):
+            if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+                return f"{name}: se esperaba lista de strings"
+            return None
+
+    else:
+        allowed = set(spec.get("enum", []))
+
+        def check(value):
+            if not isinstance(value, str):
+                return f"{name}: se esperaba string"
+            if allowed and value not in allowed:
+                return f"{name}: valor no permitido '{value}'"
+            return None
+
+    return check
+
+
+_CHECKERS = {name: _compile_checker(name, spec) for name, spec in ANALYSIS_FIELDS.items()}
+
+
+def validate_analysis(data: object) -> List[str]:
+    """
+    Valida un análisis contra el esquema.
+
+    Args:
+        data: Análisis ya parseado
+
+    Returns:
+        Lista de errores (vacía si es válido)
+    """
+    if not isinstance(data, dict):
+        return ["el análisis no es un objeto JSON"]
+
+    errors = []
+    for name, check in _CHECKERS.items():
+        if name not in data:
+            errors.append(f"{name}: campo faltante")
+            continue
+        error = check(data[name])
+        if error:
+            errors.append(error)
+    return errors
+
+
+_FENCE_RE = re.compile(r"^```[a-zA-Z]*\s*|\s*```$")
+_TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+_NUMBER_RE = re.compile(r"\s*-?\d+(?:\.\d+)?\s*")
+
+
+def _repair_text(raw_output: str) -> str:
+    """Quita fences de markdown, texto alrededor del JSON y comas finales."""
+    text = _FENCE_RE.sub("", raw_output.strip())
+    start, end = text.find("{"), text.rfind("}")
+    if start != -1 and end > start:
+        text = text[start : end + 1]
+    return _TRAILING_COMMA_RE.sub(r"\1", text)
+
+
+def _repair_value(spec: Dict, value):
+    """Intenta convertir un valor al tipo del campo. Devuelve None si no es posible."""
+    field_type = spec["type"]
+
+    if field_type == "integer":
+        # Solo números completos y enteros ("8", 8.0); nunca se extraen ni redondean ni acotan
+        if isinstance(value, bool):
+            return None
+        if isinstance(value, str):
+            if not _NUMBER_RE.fullmatch(value):
+                return None
+            value = float(value)
+        if isinstance(value, float):
+            if not value.is_integer():
+                return None
+            value = int(value)
+        if isinstance(value, int) and spec["min"] <= value <= spec["max"]:
+            return value
+        return None
+
+    if field_type == "array":
+        if isinstance(value, str):
+            return [value] if value.strip() else []
+        if isinstance(value, list):
+            return [item if isinstance(item, str) else json.dumps(item, ensure_ascii=False) for item in value]
+        return None
+
+    if value is None:
+        return None
+    value = str(value).strip()
+    if "enum" in spec:
+        normalized = value.lower().replace(" ", "_")
+        if "sí" in spec["enum"]:
+            normalized = {"si": "sí", "yes": "sí", "true": "sí", "false": "no"}.get(normalized, normalized)
+        for option in spec["enum"]:
+            if normalized == option.lower().replace(" ", "_"):
+                return option
+        return None
+    return value
+
+
+def coerce_analysis(data: object) -> Tuple[Optional[Dict], bool, List[str]]:
+    """
+    Valida un análisis parseado y repara localmente los defectos comunes.
+
+    Solo hace conversiones que no cambian el dato (p. ej. "8" u 8.0 a 8, un
+    string suelto a lista de un elemento, enums con otra capitalización) y
+    completa con su default los campos no críticos que falten. Los valores
+    presentes que no se pueden convertir sin perder información (fuera de
+    rango, decimales, texto libre) son errores, y los scores clave
+    (KEY_SCORE_FIELDS) nunca se inventan.
+
+    Args:
+        data: Análisis ya parseado
+
+    Returns:
+        Tupla (análisis, si fue reparado, errores que no se pudieron reparar)
+    """
+    if not isinstance(data, dict):
+        return None, False, ["el análisis no es un objeto JSON"]
+
+    if not validate_analysis(data) and len(data) == len(ANALYSIS_FIELDS):
+        return data, False, []
+
+    repaired = {}
+    errors = []
+    for name, spec in ANALYSIS_FIELDS.items():
+        value = data.get(name)
+        if value is not None and _CHECKERS[name](value) is None:
+            repaired[name] = value
+            continue
+
+        if value is None:
+            if "default" not in spec:
+                errors.append(f"{name}: campo faltante")
+                continue
+            repaired[name] = spec["default"]
+            continue
+
+        fixed = _repair_value(spec, value)
+        if fixed is None:
+            errors.append(_CHECKERS[name](value) or f"{name}: valor inválido '{value}'")
+            continue
+        repaired[name] = fixed
+
+    if errors:
+        return None, False, errors
+    return repaired, True, []
+
+
+def parse_analysis(raw_output: str) -> Tuple[Optional[Dict], bool, List[str]]:
+    """
+    Parsea y valida la salida cruda del modelo, reparándola si es necesario.
+
+    Args:
+        raw_output: Texto devuelto por el modelo
+
+    Returns:
+        Tupla (análisis, si fue reparado, errores que no se pudieron reparar)
+    """
+    text_repaired = False
+    try:
+        data = _loads(raw_output)
+    except ValueError:
+        try:
+            data = _loads(_repair_text(raw_output))
+            text_repaired = True
+        except ValueError as e:
+            return None, False, [f"JSON inválido: {e}"]
+
+    analysis, value_repaired, errors = coerce_analysis(data)
+    return analysis, text_repaired or value_repaired, errors
+
+
+def parse_json(raw_output: str) -> object:
+    """Parsea JSON con el parser rápido, reparando fences y comas finales si hace falta."""
+    try:
+        return _loads(raw_output)
+    except ValueError:
+        return _loads(_repair_text(raw_output))
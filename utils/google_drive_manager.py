@@ -5,7 +5,7 @@ Permite listar carpetas, leer documentos y moverlos entre carpetas.
 
 import os
 import json
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Pattern, Tuple
 from google.oauth2.service_account import Credentials
 from googleapiclient.discovery import build
 
@@ -14,6 +14,7 @@ class GoogleDriveManager:
     """Gestor de operaciones con Google Drive."""
 
     SCOPES = ["https://www.googleapis.com/auth/drive", "https://www.googleapis.com/auth/documents.readonly"]
+    PAGE_SIZE = 1000
 
     def __init__(self, credentials_json: Optional[str] = None):
         """
@@ -50,13 +51,27 @@ class GoogleDriveManager:
             f"and trashed=false"
         )
 
-        results = (
-            self.drive_service.files()
-            .list(q=query, fields="files(id, name, createdTime, modifiedTime)", orderBy="createdTime desc")
-            .execute()
-        )
+        # La API devuelve máximo una página por llamada: seguir nextPageToken hasta el final
+        folders = []
+        page_token = None
+        while True:
+            results = (
+                self.drive_service.files()
+                .list(
+                    q=query,
+                    fields="nextPageToken, files(id, name, createdTime, modifiedTime)",
+                    orderBy="createdTime desc",
+                    pageSize=self.PAGE_SIZE,
+                    pageToken=page_token,
+                )
+                .execute()
+            )
+
+            folders.extend(results.get("files", []))
+            page_token = results.get("nextPageToken")
+            if not page_token:
+                break
 
-        folders = results.get("files", [])
         print(f"Encontradas {len(folders)} carpetas en {parent_folder_id}")
         return folders
 
@@ -101,15 +116,7 @@ class GoogleDriveManager:
         try:
             document = self.docs_service.documents().get(documentId=document_id).execute()
 
-            content_parts = []
-            for element in document.get("body", {}).get("content", []):
-                if "paragraph" in element:
-                    para = element["paragraph"]
-                    for text_run in para.get("elements", []):
-                        if "textRun" in text_run:
-                            content_parts.append(text_run["textRun"]["content"])
-
-            full_text = "".join(content_parts)
+            full_text = "".join(text for _, text in self._text_runs(document))
             print(f"Documento leído: {len(full_text)} caracteres")
             return full_text
 
@@ -117,6 +124,29 @@ class GoogleDriveManager:
             print(f"Error leyendo documento {document_id}: {e}")
             raise
 
+    @staticmethod
+    def _text_runs(document: Dict) -> List[Tuple[int, str]]:
+        """Devuelve (startIndex, texto) de cada textRun de los párrafos del cuerpo, en orden."""
+        runs = []
+        for element in document.get("body", {}).get("content", []):
+            if "paragraph" in element:
+                para = element["paragraph"]
+                for text_run in para.get("elements", []):
+                    if "textRun" in text_run:
+                        runs.append((text_run.get("startIndex", 0), text_run["textRun"]["content"]))
+        return runs
+
+    @staticmethod
+    def _document_index(runs: List[Tuple[int, str]], offset: int) -> int:
+        """Convierte un offset en el texto concatenado a índice del documento (la API cuenta en UTF-16)."""
+        position = 0
+        for start_index, text in runs:
+            if offset < position + len(text):
+                return start_index + len(text[: offset - position].encode("utf-16-le")) // 2
+            position += len(text)
+        start_index, text = runs[-1]
+        return start_index + len(text.encode("utf-16-le")) // 2
+
     def read_document_tab(self, document_id: str, tab_name: str) -> Optional[str]:
         """
         Lee el contenido de una pestaña específica del documento.
@@ -142,8 +172,7 @@ class GoogleDriveManager:
             content: Contenido a agregar
         """
         try:
-            # Agregamos el contenido al final del documento
-            requests = [{"insertText": {"location": {"index": 1}, "text": f"\n\n--- {tab_name} ---\n\n{content}\n"}}]
+            requests = [self._section_insert_request(tab_name, content)]
 
             self.docs_service.documents().batchUpdate(documentId=document_id, body={"requests": requests}).execute()
 
@@ -153,6 +182,52 @@ class GoogleDriveManager:
             print(f"Error creando sección: {e}")
             raise
 
+    def replace_document_section(self, document_id: str, tab_name: str, content: str, section_pattern: Pattern):
+        """
+        Reemplaza las secciones existentes del documento por una nueva sección.
+
+        Borra cada fragmento que coincide con section_pattern y agrega la sección igual
+        que create_document_tab, en un solo batchUpdate.
+
+        Args:
+            document_id: ID del documento
+            tab_name: Nombre de la pestaña/sección
+            content: Contenido a agregar
+            section_pattern: Regex compilada que reconoce una sección previa en el texto del documento
+        """
+        try:
+            document = self.docs_service.documents().get(documentId=document_id).execute()
+            runs = self._text_runs(document)
+            full_text = "".join(text for _, text in runs)
+
+            # El último salto de línea del cuerpo no se puede borrar
+            body_content = document.get("body", {}).get("content", [])
+            body_end = body_content[-1].get("endIndex", 1) - 1 if body_content else 1
+
+            requests = []
+            # De atrás hacia adelante, para que los índices de los rangos anteriores no cambien
+            for match in reversed(list(section_pattern.finditer(full_text))):
+                start_index = self._document_index(runs, match.start())
+                end_index = min(self._document_index(runs, match.end()), body_end)
+                if end_index > start_index:
+                    requests.append(
+                        {"deleteContentRange": {"range": {"startIndex": start_index, "endIndex": end_index}}}
+                    )
+            requests.append(self._section_insert_request(tab_name, content))
+
+            self.docs_service.documents().batchUpdate(documentId=document_id, body={"requests": requests}).execute()
+
+            print(f"Sección '{tab_name}' reemplazada en el documento ({len(requests) - 1} secciones previas borradas)")
+
+        except Exception as e:
+            print(f"Error reemplazando sección: {e}")
+            raise
+
+    @staticmethod
+    def _section_insert_request(tab_name: str, content: str) -> Dict:
+        # La sección se inserta al inicio del cuerpo (índice 1), antes de la transcripción
+        return {"insertText": {"location": {"index": 1}, "text": f"\n\n--- {tab_name} ---\n\n{content}\n"}}
+
     def move_file(self, file_id: str, current_parent_id: str, new_parent_id: str):
         """
         Mueve un archivo de una carpeta a otra.
@@ -0,0 +1,150 @@
+"""
+Agregados incrementales de desempeño por Farmer.
+Calcula los deltas (sumas y conteos) de un lote de análisis para actualizar
+FARMER_PERFORMANCE_SUMMARY en la misma transacción que los inserts.
+"""
+
+from datetime import datetime
+from typing import Dict, List, Optional
+
+# Umbrales de cumplimiento (deben coincidir con snowflake_schema.sql)
+HITO_SCORE_MIN = 7
+ALTA_PROBABILIDAD_MIN = 70
+
+# Contadores acumulables de la tabla resumen, en orden de columnas
+SUMMARY_COUNTERS = [
+    "TOTAL_REUNIONES",
+    "SUM_CLARIDAD_PITCH",
+    "SUM_NEGOCIACION",
+    "SUM_RESOLUCION_OBJECCIONES",
+    "SUM_PROBABILIDAD_CIERRE",
+    "REUNIONES_ALTA_PROBABILIDAD",
+    "HITOS_CLARIDAD_CUMPLIDOS",
+    "HITOS_NEGOCIACION_CUMPLIDOS",
+    "HITOS_RESOLUCION_CUMPLIDOS",
+    "HITOS_DECISION_MAKER_CUMPLIDOS",
+]
+
+# Campos del análisis que alimentan los contadores (para releer filas reemplazadas)
+SUMMARY_SOURCE_FIELDS = [
+    "farmer_nombre",
+    "claridad_pitch",
+    "negociacion_habilidades",
+    "resolucion_objecciones",
+    "probabilidad_cierre",
+    "decision_maker_identificado",
+]
+
+# Recalcula el resumen completo desde la tabla de análisis. Se usa con INSERT OVERWRITE
+# (SnowflakeManager.rebuild_performance_summary y snowflake_schema.sql) para la carga inicial
+# o para reconstruirlo; es la referencia contra la que se prueban los deltas incrementales.
+SUMMARY_REBUILD_SELECT = f"""
+SELECT
+    FARMER_NAME,
+    COUNT(*) AS TOTAL_REUNIONES,
+    SUM(CLARIDAD_PITCH) AS SUM_CLARIDAD_PITCH,
+    SUM(NEGOCIACION_HABILIDADES) AS SUM_NEGOCIACION,
+    SUM(RESOLUCION_OBJECCIONES) AS SUM_RESOLUCION_OBJECCIONES,
+    SUM(PROBABILIDAD_CIERRE) AS SUM_PROBABILIDAD_CIERRE,
+    SUM(CASE WHEN PROBABILIDAD_CIERRE >= {ALTA_PROBABILIDAD_MIN} THEN 1 ELSE 0 END) AS REUNIONES_ALTA_PROBABILIDAD,
+    SUM(CASE WHEN CLARIDAD_PITCH >= {HITO_SCORE_MIN} THEN 1 ELSE 0 END) AS HITOS_CLARIDAD_CUMPLIDOS,
+    SUM(CASE WHEN NEGOCIACION_HABILIDADES >= {HITO_SCORE_MIN} THEN 1 ELSE 0 END) AS HITOS_NEGOCIACION_CUMPLIDOS,
+    SUM(CASE WHEN RESOLUCION_OBJECCIONES >= {HITO_SCORE_MIN} THEN 1 ELSE 0 END) AS HITOS_RESOLUCION_CUMPLIDOS,
+    SUM(CASE WHEN LOWER(DECISION_MAKER_IDENTIFICADO) = 'sí' THEN 1 ELSE 0 END) AS HITOS_DECISION_MAKER_CUMPLIDOS,
+    MAX(FECHA_PROCESAMIENTO) AS ULTIMA_REUNION
+FROM FARMER_MASS_MEETING_ANALYSIS
+GROUP BY FARMER_NAME
+"""
+
+
+def analysis_counters(analysis: Dict) -> Dict[str, int]:
+    """
+    Calcula la contribución de un análisis a los contadores de su Farmer.
+
+    Args:
+        analysis: Análisis validado contra el esquema
+
+    Returns:
+        Dict columna -> incremento
+    """
+    claridad = analysis["claridad_pitch"]
+    negociacion = analysis["negociacion_habilidades"]
+    resolucion = analysis["resolucion_objecciones"]
+    probabilidad = analysis["probabilidad_cierre"]
+
+    return {
+        "TOTAL_REUNIONES": 1,
+        "SUM_CLARIDAD_PITCH": claridad,
+        "SUM_NEGOCIACION": negociacion,
+        "SUM_RESOLUCION_OBJECCIONES": resolucion,
+        "SUM_PROBABILIDAD_CIERRE": probabilidad,
+        "REUNIONES_ALTA_PROBABILIDAD": int(probabilidad >= ALTA_PROBABILIDAD_MIN),
+        "HITOS_CLARIDAD_CUMPLIDOS": int(claridad >= HITO_SCORE_MIN),
+        "HITOS_NEGOCIACION_CUMPLIDOS": int(negociacion >= HITO_SCORE_MIN),
+        "HITOS_RESOLUCION_CUMPLIDOS": int(resolucion >= HITO_SCORE_MIN),
+        "HITOS_DECISION_MAKER_CUMPLIDOS": int(str(analysis["decision_maker_identificado"]).lower() == "sí"),
+    }
+
+
+def compute_performance_deltas(
+    analyses: List[Dict],
+    processed_at: Optional[datetime] = None,
+    replaced: Optional[List[Dict]] = None,
+) -> Dict[str, Dict]:
+    """
+    Agrupa un lote de análisis en deltas por Farmer.
+
+    Los análisis reemplazados (filas anteriores de documentos reprocesados) restan
+    su contribución. ULTIMA_REUNION solo avanza con análisis nuevos; un Farmer que
+    únicamente pierde filas conserva la suya hasta la siguiente reconstrucción.
+
+    Args:
+        analyses: Análisis validados del lote
+        processed_at: Fecha de procesamiento del lote (default: ahora)
+        replaced: Análisis que el lote reemplaza y deben descontarse
+
+    Returns:
+        Dict FARMER_NAME -> {columna: incremento, "ULTIMA_REUNION": datetime o None}
+    """
+    processed_at = processed_at or datetime.now()
+    deltas = {}
+
+    def delta_for(farmer_name):
+        return deltas.setdefault(farmer_name, dict(dict.fromkeys(SUMMARY_COUNTERS, 0), ULTIMA_REUNION=None))
+
+    for analysis in replaced or []:
+        delta = delta_for(analysis["farmer_nombre"])
+        for column, increment in analysis_counters(analysis).items():
+            delta[column] -= increment
+
+    for analysis in analyses:
+        delta = delta_for(analysis["farmer_nombre"])
+        for column, increment in analysis_counters(analysis).items():
+            delta[column] += increment
+        delta["ULTIMA_REUNION"] = processed_at
+
+    return deltas
+
+
+def apply_performance_deltas(summary: Dict[str, Dict], deltas: Dict[str, Dict]) -> Dict[str, Dict]:
+    """
+    Aplica deltas a un resumen en memoria con la misma semántica que el MERGE en Snowflake.
+
+    Args:
+        summary: Resumen actual FARMER_NAME -> fila
+        deltas: Deltas calculados con compute_performance_deltas
+
+    Returns:
+        El resumen actualizado (se modifica in-place)
+    """
+    for farmer_name, delta in deltas.items():
+        row = summary.get(farmer_name)
+        if row is None:
+            summary[farmer_name] = dict(delta)
+            continue
+        for column in SUMMARY_COUNTERS:
+            row[column] += delta[column]
+        if delta["ULTIMA_REUNION"] is not None:
+            row["ULTIMA_REUNION"] = max(row["ULTIMA_REUNION"] or delta["ULTIMA_REUNION"], delta["ULTIMA_REUNION"])
+
+    return summary
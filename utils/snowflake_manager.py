@@ -6,9 +6,17 @@ Permite escribir resultados de análisis de reuniones.
 import os
 import json
 from datetime import datetime
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 import snowflake.connector
 
+from .analysis_schema import ANALYSIS_FIELDS, coerce_analysis
+from .performance_summary import (
+    SUMMARY_COUNTERS,
+    SUMMARY_REBUILD_SELECT,
+    SUMMARY_SOURCE_FIELDS,
+    compute_performance_deltas,
+)
+
 
 class SnowflakeManager:
     """Gestor de operaciones con Snowflake."""
@@ -107,10 +115,20 @@ class SnowflakeManager:
         )
         """
 
+        counter_columns = ",\n            ".join(f"{column} NUMBER DEFAULT 0" for column in SUMMARY_COUNTERS)
+        create_summary_sql = f"""
+        CREATE TABLE IF NOT EXISTS FARMER_PERFORMANCE_SUMMARY (
+            FARMER_NAME VARCHAR(500) PRIMARY KEY,
+            {counter_columns},
+            ULTIMA_REUNION TIMESTAMP_NTZ
+        )
+        """
+
         try:
             cursor = self.conn.cursor()
             cursor.execute(create_table_sql)
-            print("Tabla FARMER_MASS_MEETING_ANALYSIS verificada/creada")
+            cursor.execute(create_summary_sql)
+            print("Tablas FARMER_MASS_MEETING_ANALYSIS y FARMER_PERFORMANCE_SUMMARY verificadas/creadas")
             cursor.close()
         except Exception as e:
             print(f"Error creando tabla: {e}")
@@ -129,80 +147,65 @@ class SnowflakeManager:
         Returns:
             True si fue exitoso
         """
-        try:
-            # Generar ID único
-            analysis_id = f"{folder_id}_{document_id}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
-
-            insert_sql = """
-            INSERT INTO FARMER_MASS_MEETING_ANALYSIS (
-                ID,
-                ALIADO_NAME,
-                FARMER_NAME,
-                HUNTER_NAME,
-                FECHA_REUNION,
-                DURACION_MINUTOS,
-                TIPO_REUNION,
-                CLARIDAD_PITCH,
-                NEGOCIACION_HABILIDADES,
-                RESOLUCION_OBJECCIONES,
-                FOLLOWUP_COMPROMISOS,
-                NIVEL_INTERES_CLIENTE,
-                OBJECIONES_PRINCIPALES,
-                NECESIDADES_DETECTADAS,
-                DECISION_MAKER_IDENTIFICADO,
-                NOMBRE_DECISION_MAKER,
-                PROBABILIDAD_CIERRE,
-                NEXT_STEPS,
-                RIESGOS,
-                RESUMEN_BREVE,
-                TEMAS_NO_MENCIONADOS,
-                LINK_DOCUMENTO,
-                FOLDER_ID,
-                DOCUMENT_ID,
-                ANALISIS_COMPLETO_JSON
-            ) VALUES (
-                %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,
-                PARSE_JSON(%s), %s, PARSE_JSON(%s), PARSE_JSON(%s), %s, %s,
-                %s, PARSE_JSON(%s), PARSE_JSON(%s), %s, PARSE_JSON(%s),
-                %s, %s, %s, PARSE_JSON(%s)
-            )
-            """
-
-            # Preparar valores
-            values = (
-                analysis_id,
-                analysis_data.get("cliente_nombre", "No mencionado"),
-                analysis_data.get("farmer_nombre", "No mencionado"),
-                analysis_data.get("hunter_nombre", "No mencionado"),
-                analysis_data.get("fecha_reunion", "No mencionado"),
-                analysis_data.get("duracion_minutos", 0),
-                analysis_data.get("tipo_reunion", "No mencionado"),
-                analysis_data.get("claridad_pitch", 0),
-                analysis_data.get("negociacion_habilidades", 0),
-                analysis_data.get("resolucion_objecciones", 0),
-                json.dumps(analysis_data.get("followup_compromisos", [])),
-                analysis_data.get("nivel_interes_cliente", "No mencionado"),
-                json.dumps(analysis_data.get("objeciones_principales", [])),
-                json.dumps(analysis_data.get("necesidades_detectadas", [])),
-                analysis_data.get("decision_maker_identificado", "No mencionado"),
-                analysis_data.get("nombre_decision_maker", "No mencionado"),
-                analysis_data.get("probabilidad_cierre", 0),
-                json.dumps(analysis_data.get("next_steps", [])),
-                json.dumps(analysis_data.get("riesgos", [])),
-                analysis_data.get("resumen_breve", "No mencionado"),
-                json.dumps(analysis_data.get("temas_no_mencionados", [])),
-                link_documento,
-                folder_id,
-                document_id,
-                json.dumps(analysis_data),
-            )
+        return self.insert_analyses_batch(
+            [
+                {
+                    "analysis_data": analysis_data,
+                    "document_id": document_id,
+                    "folder_id": folder_id,
+                    "link_documento": link_documento,
+                }
+            ]
+        )
+
+    def insert_analyses_batch(self, records: List[Dict]) -> bool:
+        """
+        Inserta un lote de análisis y actualiza FARMER_PERFORMANCE_SUMMARY en la misma transacción.
+
+        Los deltas por Farmer se calculan en Python (compute_performance_deltas) y se
+        aplican con un MERGE por Farmer, de modo que VW_FARMER_PERFORMANCE lee la tabla
+        resumen en lugar de recorrer toda la tabla de análisis. Un documento reprocesado
+        reemplaza su fila anterior: se borra y su contribución se resta del resumen.
+
+        Args:
+            records: Lista de dicts con analysis_data, document_id, folder_id y link_documento
+
+        Returns:
+            True si fue exitoso
+        """
+        if not records:
+            return True
+
+        processed_at = datetime.now()
+        rows_by_document = {}
+
+        # Validar todo el lote antes de abrir la transacción (si un documento se repite, gana el último)
+        for record in records:
+            analysis, _, errors = coerce_analysis(record["analysis_data"])
+            if errors:
+                raise ValueError(f"Análisis inválido para {record['document_id']}: {'; '.join(errors)}")
+            rows_by_document[record["document_id"]] = (analysis, record)
 
+        rows = list(rows_by_document.values())
+        analyses = [analysis for analysis, _ in rows]
+
+        cursor = None
+        try:
             cursor = self.conn.cursor()
-            cursor.execute(insert_sql, values)
-            self.conn.commit()
-            cursor.close()
+            cursor.execute("BEGIN")
 
-            print(f"Análisis insertado en Snowflake: {analysis_id}")
+            replaced = self._delete_previous_rows(cursor, list(rows_by_document))
+
+            for analysis, record in rows:
+                self._insert_row(cursor, analysis, record, processed_at)
+
+            self._merge_performance_deltas(cursor, compute_performance_deltas(analyses, processed_at, replaced))
+
+            self.conn.commit()
+            print(
+                f"{len(rows)} análisis insertados en Snowflake ({len(replaced)} filas anteriores reemplazadas) "
+                "y resumen por Farmer actualizado"
+            )
             return True
 
         except Exception as e:
@@ -211,6 +214,127 @@ class SnowflakeManager:
                 self.conn.rollback()
             raise
 
+        finally:
+            if cursor:
+                cursor.close()
+
+    def _delete_previous_rows(self, cursor, document_ids: List[str]) -> List[Dict]:
+        """
+        Borra las filas existentes de los documentos del lote.
+
+        Args:
+            cursor: Cursor dentro de la transacción del lote
+            document_ids: IDs de documento del lote
+
+        Returns:
+            Análisis borrados (solo los campos del resumen), para restar su contribución
+        """
+        columns = [ANALYSIS_FIELDS[field]["column"] for field in SUMMARY_SOURCE_FIELDS]
+        placeholders = ", ".join("%s" for _ in document_ids)
+
+        cursor.execute(
+            f"SELECT {', '.join(columns)} FROM FARMER_MASS_MEETING_ANALYSIS WHERE DOCUMENT_ID IN ({placeholders})",
+            tuple(document_ids),
+        )
+        replaced = []
+        rows = cursor.fetchall()
+        for row in rows:
+            analysis = dict(zip(SUMMARY_SOURCE_FIELDS, row))
+            if analysis["farmer_nombre"] is None:
+                # El MERGE nunca empareja FARMER_NAME NULL, así que no hay contribución que restar
+                continue
+            # Filas anteriores al esquema validado pueden tener puntajes NULL (SUM los ignora)
+            for field in SUMMARY_SOURCE_FIELDS:
+                if ANALYSIS_FIELDS[field]["type"] == "integer" and analysis[field] is None:
+                    analysis[field] = 0
+            replaced.append(analysis)
+
+        if rows:
+            cursor.execute(
+                f"DELETE FROM FARMER_MASS_MEETING_ANALYSIS WHERE DOCUMENT_ID IN ({placeholders})",
+                tuple(document_ids),
+            )
+
+        return replaced
+
+    def _insert_row(self, cursor, analysis: Dict, record: Dict, processed_at: datetime):
+        """Inserta una fila en FARMER_MASS_MEETING_ANALYSIS."""
+        folder_id = record["folder_id"]
+        document_id = record["document_id"]
+
+        # Generar ID único
+        analysis_id = f"{folder_id}_{document_id}_{processed_at.strftime('%Y%m%d%H%M%S')}"
+
+        columns = ["ID"]
+        placeholders = ["%s"]
+        values = [analysis_id]
+
+        for field_name, spec in ANALYSIS_FIELDS.items():
+            columns.append(spec["column"])
+            if spec["type"] == "array":
+                placeholders.append("PARSE_JSON(%s)")
+                values.append(json.dumps(analysis[field_name], ensure_ascii=False))
+            else:
+                placeholders.append("%s")
+                values.append(analysis[field_name])
+
+        columns += ["LINK_DOCUMENTO", "FOLDER_ID", "DOCUMENT_ID", "FECHA_PROCESAMIENTO", "ANALISIS_COMPLETO_JSON"]
+        placeholders += ["%s", "%s", "%s", "%s", "PARSE_JSON(%s)"]
+        values += [
+            record["link_documento"],
+            folder_id,
+            document_id,
+            processed_at,
+            json.dumps(analysis, ensure_ascii=False),
+        ]
+
+        insert_sql = (
+            f"INSERT INTO FARMER_MASS_MEETING_ANALYSIS ({', '.join(columns)}) "
+            f"SELECT {', '.join(placeholders)}"
+        )
+        cursor.execute(insert_sql, tuple(values))
+        print(f"Análisis insertado en Snowflake: {analysis_id}")
+
+    def _merge_performance_deltas(self, cursor, deltas: Dict[str, Dict]):
+        """Suma los deltas por Farmer en FARMER_PERFORMANCE_SUMMARY."""
+        source_columns = ", ".join(f"%s AS {column}" for column in SUMMARY_COUNTERS)
+        update_set = ", ".join(f"t.{column} = t.{column} + s.{column}" for column in SUMMARY_COUNTERS)
+        insert_columns = ", ".join(SUMMARY_COUNTERS)
+        insert_values = ", ".join(f"s.{column}" for column in SUMMARY_COUNTERS)
+
+        merge_sql = f"""
+        MERGE INTO FARMER_PERFORMANCE_SUMMARY t
+        USING (SELECT %s AS FARMER_NAME, {source_columns}, %s::TIMESTAMP_NTZ AS ULTIMA_REUNION) s
+        ON t.FARMER_NAME = s.FARMER_NAME
+        WHEN MATCHED THEN UPDATE SET
+            {update_set},
+            t.ULTIMA_REUNION = GREATEST(
+                COALESCE(t.ULTIMA_REUNION, s.ULTIMA_REUNION), COALESCE(s.ULTIMA_REUNION, t.ULTIMA_REUNION)
+            )
+        WHEN NOT MATCHED THEN INSERT (FARMER_NAME, {insert_columns}, ULTIMA_REUNION)
+            VALUES (s.FARMER_NAME, {insert_values}, s.ULTIMA_REUNION)
+        """
+
+        for farmer_name, delta in deltas.items():
+            values = [farmer_name] + [delta[column] for column in SUMMARY_COUNTERS] + [delta["ULTIMA_REUNION"]]
+            cursor.execute(merge_sql, tuple(values))
+
+    def rebuild_performance_summary(self):
+        """
+        Reconstruye FARMER_PERFORMANCE_SUMMARY completa desde FARMER_MASS_MEETING_ANALYSIS.
+
+        INSERT OVERWRITE reemplaza todas las filas en una sola sentencia, así que es
+        seguro ejecutarlo aunque el resumen ya tenga deltas aplicados.
+        """
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute(f"INSERT OVERWRITE INTO FARMER_PERFORMANCE_SUMMARY {SUMMARY_REBUILD_SELECT}")
+            cursor.close()
+            print("Resumen FARMER_PERFORMANCE_SUMMARY reconstruido")
+        except Exception as e:
+            print(f"Error reconstruyendo resumen: {e}")
+            raise
+
     def check_already_processed(self, document_id: str) -> bool:
         """
         Verifica si un documento ya fue procesado.